@@ -0,0 +1,114 @@
+"""Adaptive practice selection for the Morse Code Trainer.
+
+Characters (or words) the trainee gets wrong or answers slowly are drawn
+more often. Sampling is O(1) through an alias table; answers update the
+weights in O(1) amortized time without rebuilding the table every time.
+"""
+import random
+
+ALPHA = 0.3               # EWMA weight of the newest answer
+ERROR_WEIGHT = 4.0        # extra weight for an item that is always missed
+LATENCY_WEIGHT = 1.0      # extra weight per TARGET_MS of average answer time
+TARGET_MS = 1500.0        # answer time we consider "copied comfortably"
+MAX_LATENCY_RATIO = 3.0
+PRIOR_ERROR = 0.5         # items with no history are treated as half-known
+MIN_ACCEPTANCE = 0.5      # rebuild when the bounds get this loose
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per draw."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to rounding error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=random):
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class AdaptiveSelector:
+    """Draws practice items weighted by recent error rate and answer time.
+
+    The alias table is built over an upper bound of every weight and a
+    draw is accepted with probability weight / bound. An answer only
+    changes one weight; the table is rebuilt just when a weight outgrows
+    its bound (bounds then double) or the bounds get too loose, so updates
+    are O(1) amortized and draws stay O(1) expected.
+    """
+
+    def __init__(self, items, rng=random):
+        self.items = list(dict.fromkeys(items))
+        self.index = {item: i for i, item in enumerate(self.items)}
+        self.error = [PRIOR_ERROR] * len(self.items)
+        self.latency_ms = [TARGET_MS] * len(self.items)
+        self.rng = rng
+        self.weights = [self._weight(i) for i in range(len(self.items))]
+        self._rebuild()
+
+    @classmethod
+    def from_stats(cls, items, stats, rng=random):
+        """Seed from practice_stats char_accuracy() results."""
+        selector = cls(items, rng)
+        for item, (_, accuracy, mean_ms) in stats.items():
+            i = selector.index.get(item)
+            if i is not None:
+                selector.error[i] = 1.0 - accuracy
+                selector.latency_ms[i] = mean_ms
+                selector.weights[i] = selector._weight(i)
+        selector._rebuild()
+        return selector
+
+    def _weight(self, i):
+        latency = min(self.latency_ms[i] / TARGET_MS, MAX_LATENCY_RATIO)
+        return 1.0 + ERROR_WEIGHT * self.error[i] + LATENCY_WEIGHT * latency
+
+    def _rebuild(self):
+        self.bounds = list(self.weights)
+        self.bound_total = sum(self.bounds)
+        self.weight_total = sum(self.weights)
+        self.table = AliasTable(self.bounds)
+
+    def choice(self):
+        while True:
+            i = self.table.sample(self.rng)
+            if self.rng.random() * self.bounds[i] < self.weights[i]:
+                return self.items[i]
+
+    def update(self, item, correct, response_ms):
+        """Fold one answer into the item's error and latency averages."""
+        i = self.index.get(item)
+        if i is None:
+            return
+        self.error[i] += ALPHA * ((0.0 if correct else 1.0) - self.error[i])
+        self.latency_ms[i] += ALPHA * (response_ms - self.latency_ms[i])
+        old = self.weights[i]
+        self.weights[i] = self._weight(i)
+        self.weight_total += self.weights[i] - old
+        if self.weights[i] > self.bounds[i]:
+            self._raise_bound(i)
+        elif self.weight_total < MIN_ACCEPTANCE * self.bound_total:
+            self._rebuild()
+
+    def _raise_bound(self, i):
+        self.bounds[i] = 2.0 * self.weights[i]
+        self.bound_total = sum(self.bounds)
+        self.table = AliasTable(self.bounds)
+
+    def probabilities(self):
+        """Current draw probability of every item (for display)."""
+        return {item: w / self.weight_total for item, w in zip(self.items, self.weights)}
@@ -0,0 +1,95 @@
+"""Audio output calibration for the Morse Code Trainer.
+
+For each candidate mixer buffer size the mixer is reopened and two
+things are measured:
+
+- latency: a short tone is played and timed until the mixer has finished
+  it. The overshoot past the tone's own length is how late the mixer
+  picks up new sound; one more buffer is added for the device buffer
+  still to be heard. Only the part of the output path that pygame can
+  see is measured. Driver and hardware latency below SDL are not.
+- underruns: tone blocks of two buffers each are streamed back to back
+  from Python (as the pileup does), rendering every next block while the
+  current one plays. The mixer running dry before the next block is
+  queued counts as an underrun.
+
+The smallest buffer with no more than MAX_UNDERRUN_RATE underruns is safe.
+
+Run it through morsecode.calibrate_audio(), which reopens the mixer with
+the chosen settings afterwards.
+"""
+import time
+
+import numpy as np
+
+from pileup import stream
+
+CANDIDATE_BUFFERS = (64, 128, 256, 512, 1024, 2048, 4096)
+SAMPLE_RATES = (8000, 11025, 16000, 22050, 32000, 44100, 48000)
+LATENCY_TRIALS = 12
+PROBE_SECONDS = 0.03
+STREAM_SECONDS = 1.5
+MAX_UNDERRUN_RATE = 0.01
+
+
+def probe_tone(frequency, count, sample_rate):
+    t = np.arange(count) / sample_rate
+    return np.int16(np.sin(2 * np.pi * frequency * t) * 32767 * 0.3)
+
+
+def measure_latency(pygame, buffer, sample_rate, frequency=600):
+    """(median, worst) output latency in seconds."""
+    length = int(PROBE_SECONDS * sample_rate)
+    sound = pygame.sndarray.make_sound(probe_tone(frequency, length, sample_rate))
+    overshoots = []
+    for _ in range(LATENCY_TRIALS):
+        started = time.perf_counter()
+        channel = sound.play()
+        while channel.get_busy():
+            time.sleep(0.0002)
+        overshoots.append(time.perf_counter() - started - length / sample_rate)
+        time.sleep(0.01)
+    # The last buffer is mixed ahead of time, so the overshoot can come out negative
+    device = buffer / sample_rate
+    return max(0.0, float(np.median(overshoots))) + device, max(0.0, max(overshoots)) + device
+
+
+def measure_underruns(pygame, buffer, sample_rate, frequency=600):
+    """(underruns, blocks) streaming two-buffer blocks for STREAM_SECONDS."""
+    step = 2 * buffer
+    count = max(8, int(STREAM_SECONDS * sample_rate / step))
+
+    def blocks():
+        for i in range(count):
+            # Render each block on demand, as a live stream would
+            n = np.arange(i * step, (i + 1) * step)
+            yield np.int16(np.sin(2 * np.pi * frequency * n / sample_rate) * 32767 * 0.3)
+
+    return stream(blocks(), pygame), count
+
+
+def calibrate(pygame, sample_rate, buffers=CANDIDATE_BUFFERS, report=print):
+    """Measure each buffer size; returns a list of result dicts, smallest buffer first."""
+    results = []
+    for buffer in buffers:
+        pygame.mixer.quit()
+        try:
+            pygame.mixer.init(frequency=sample_rate, size=-16, channels=1, buffer=buffer)
+        except pygame.error as e:
+            report(f"{buffer:>5}: cannot open ({e})")
+            continue
+        rate = pygame.mixer.get_init()[0]
+        latency, worst = measure_latency(pygame, buffer, rate)
+        underruns, blocks = measure_underruns(pygame, buffer, rate)
+        result = dict(buffer=buffer, sample_rate=rate, latency=latency, worst=worst,
+                      underruns=underruns, blocks=blocks,
+                      safe=underruns <= MAX_UNDERRUN_RATE * blocks)
+        results.append(result)
+        report(f"{buffer:>5}: latency {latency * 1000:6.1f} ms (worst {worst * 1000:6.1f} ms), "
+               f"underruns {underruns}/{blocks}{'' if result['safe'] else '  UNSAFE'}")
+    return results
+
+
+def smallest_safe(results):
+    """The safe result with the smallest buffer, or None."""
+    return next((r for r in results if r["safe"]), None)
@@ -0,0 +1,219 @@
+"""Simulated band conditions for the Morse Code Trainer.
+
+Instead of clean tones, a compiled timeline (see morsecode.compile_timeline)
+is synthesized as it would sound off the air:
+
+- QSB: slow fading of the signal strength
+- drift: the tone wanders in pitch (phase-accumulation synthesis, so a
+  rendered sine can't be reused; the key envelope comes from the timeline)
+- QRM: other stations calling CQ close by in frequency
+- QRN/white noise: hiss plus static crashes
+
+Every effect is a function of the absolute sample position, and each
+block is computed with numpy in one pass. Blocks can therefore be rendered
+in any order (the export process pool does that) and still join without
+clicks.
+"""
+import random
+
+import numpy as np
+
+from morsecode import KEY_DOWN, SAMPLE_RATE, compile_timeline
+
+BLOCK_SECONDS = 1.0
+RAMP_SECONDS = 0.005        # same 5 ms key-click ramps as generate_tone
+SIGNAL_LEVEL = 0.5          # headroom for noise and interference
+FADE_TERMS = 3
+DRIFT_TERMS = 2
+CONTROL_STEP = 64           # fading and drift are computed every this many samples
+NOISE_CELL = 1 << 16        # noise grid in samples; longer than any static crash
+QRM_CALLS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+PRESETS = {
+    "off": None,
+    "light": dict(snr_db=24.0, qrn_per_s=0.2, fade_depth=0.2, drift_hz=3.0, qrm_stations=0),
+    "moderate": dict(snr_db=12.0, qrn_per_s=1.0, fade_depth=0.5, drift_hz=8.0, qrm_stations=1),
+    "heavy": dict(snr_db=6.0, qrn_per_s=3.0, fade_depth=0.8, drift_hz=20.0, qrm_stations=2),
+}
+
+
+def conditions(name, seed=None):
+    """BandConditions for a preset name, or None for "off"."""
+    preset = PRESETS[name]
+    return None if preset is None else BandConditions(seed=seed, **preset)
+
+
+def ramped(mask, ramp):
+    """Moving average of a 0/1 key mask: linear ramps of `ramp` samples.
+
+    mask must start with ramp - 1 samples of history before the block.
+    """
+    sums = np.cumsum(mask, dtype=np.float64)
+    sums[ramp:] = sums[ramp:] - sums[:-ramp]
+    return (sums[ramp - 1:] / ramp).astype(np.float32)
+
+
+def key_envelope(timeline, sample_rate=SAMPLE_RATE, looped=False):
+    """Float32 key envelope of a whole timeline with RAMP_SECONDS ramps.
+
+    A looped envelope ramps in from its own end instead of from silence.
+    """
+    mask = np.repeat((timeline["key"] == KEY_DOWN).astype(np.float32),
+                     timeline["samples"].astype(np.int64))
+    ramp = max(1, int(RAMP_SECONDS * sample_rate))
+    history = mask[len(mask) - (ramp - 1):] if looped else np.zeros(ramp - 1, dtype=np.float32)
+    return ramped(np.concatenate([history, mask]), ramp)
+
+
+class BandConditions:
+    """One simulated path: signal fading and drift, QRM stations and noise."""
+
+    def __init__(self, snr_db=None, qrn_per_s=0.0, fade_depth=0.0, fade_hz=0.1,
+                 drift_hz=0.0, drift_period_s=30.0, qrm_stations=0, seed=None):
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        rng = np.random.default_rng(self.seed)
+        self.noise_sigma = 0.0 if snr_db is None else SIGNAL_LEVEL / np.sqrt(2) / 10 ** (snr_db / 20)
+        self.qrn_per_s = qrn_per_s
+        self.fade_depth = fade_depth
+        self.fade_w = 2 * np.pi * fade_hz * rng.uniform(0.5, 1.5, FADE_TERMS)
+        self.fade_phase = rng.uniform(0, 2 * np.pi, FADE_TERMS)
+        # Frequency offset is sum(a * sin(w t + p)); its integral gives the phase
+        self.drift_a = np.full(DRIFT_TERMS, drift_hz / DRIFT_TERMS)
+        self.drift_w = 2 * np.pi / (drift_period_s * rng.uniform(0.6, 1.4, DRIFT_TERMS))
+        self.drift_phase = rng.uniform(0, 2 * np.pi, DRIFT_TERMS)
+        self.qrm = [dict(offset_hz=rng.choice([-1, 1]) * rng.uniform(120, 500),
+                         gain=10 ** (rng.uniform(-16, -4) / 20),
+                         wpm=int(rng.integers(14, 30)),
+                         call="".join(rng.choice(list(QRM_CALLS), 3)) + str(rng.integers(0, 10)),
+                         phase=rng.uniform(0, 2 * np.pi))
+                    for _ in range(qrm_stations)]
+        self._qrm_envelopes = {}
+        self._noise_cells = {}
+
+    # === Pieces, each a function of absolute time ===
+    # Both vary over seconds, so they are evaluated on a coarse grid and interpolated
+    def _fading(self, t, coarse):
+        if not self.fade_depth:
+            return 1.0
+        wave = np.sin(np.outer(coarse, self.fade_w) + self.fade_phase).mean(axis=1)
+        return np.interp(t, coarse, 1.0 - self.fade_depth * (0.5 + 0.5 * wave)).astype(np.float32)
+
+    def _phase(self, frequency, t, coarse):
+        phase = 2 * np.pi * frequency * t
+        if self.drift_a.any():
+            # Integral of the drift, zero at t = 0
+            integral = (self.drift_a / self.drift_w) * (
+                np.cos(self.drift_phase) - np.cos(np.outer(coarse, self.drift_w) + self.drift_phase))
+            phase += 2 * np.pi * np.interp(t, coarse, integral.sum(axis=1))
+        return phase
+
+    def _qrm_envelope(self, station, sample_rate):
+        """The station's CQ call as one looped, ramped key envelope."""
+        key = (station["call"], sample_rate)
+        envelope = self._qrm_envelopes.get(key)
+        if envelope is None:
+            text = f"CQ CQ DE {station['call']} {station['call']} K   "
+            timeline = compile_timeline(text, station["wpm"], station["wpm"], 1.0, sample_rate)
+            envelope = key_envelope(timeline, sample_rate, looped=True)
+            self._qrm_envelopes[key] = envelope
+        return envelope
+
+    def _crashes(self, cell, sample_rate):
+        """Static crashes starting in one noise cell, as (start in the cell, samples) pairs."""
+        rng = np.random.default_rng([self.seed, cell, 1])
+        crashes = []
+        for _ in range(rng.poisson(self.qrn_per_s * NOISE_CELL / sample_rate)):
+            at = int(rng.integers(0, NOISE_CELL))
+            tau = rng.uniform(0.003, 0.02) * sample_rate
+            decay = np.exp(-np.arange(min(NOISE_CELL, int(5 * tau))) / tau)
+            crashes.append((at, (rng.uniform(0.3, 1.0) * decay
+                                 * rng.standard_normal(len(decay))).astype(np.float32)))
+        return crashes
+
+    def _noise_cell(self, cell, sample_rate):
+        """Hiss and crashes for samples cell * NOISE_CELL onwards; the last two cells are kept."""
+        key = (cell, sample_rate)
+        noise = self._noise_cells.get(key)
+        if noise is not None:
+            return noise
+        noise = np.zeros(NOISE_CELL, dtype=np.float32)
+        if self.noise_sigma:
+            rng = np.random.default_rng([self.seed, cell, 0])
+            noise += rng.normal(0.0, self.noise_sigma, NOISE_CELL).astype(np.float32)
+        if self.qrn_per_s:
+            # Crashes late in the previous cell ring on into this one
+            for origin in (cell - 1, cell):
+                if origin < 0:
+                    continue
+                for at, crash in self._crashes(origin, sample_rate):
+                    at += (origin - cell) * NOISE_CELL
+                    lo, hi = max(at, 0), min(at + len(crash), NOISE_CELL)
+                    if lo < hi:
+                        noise[lo:hi] += crash[lo - at:hi - at]
+        if len(self._noise_cells) >= 2:
+            del self._noise_cells[next(iter(self._noise_cells))]
+        self._noise_cells[key] = noise
+        return noise
+
+    def _noise(self, n0, count, sample_rate):
+        # Drawn on a fixed grid of absolute samples, so the noise doesn't
+        # depend on where a render (or an export segment) starts
+        noise = np.empty(count, dtype=np.float32)
+        for cell in range(n0 // NOISE_CELL, (n0 + count - 1) // NOISE_CELL + 1):
+            lo, hi = max(n0, cell * NOISE_CELL), min(n0 + count, (cell + 1) * NOISE_CELL)
+            noise[lo - n0:hi - n0] = self._noise_cell(cell, sample_rate)[lo - cell * NOISE_CELL:
+                                                                           hi - cell * NOISE_CELL]
+        return noise
+
+    # === Rendering ===
+    @staticmethod
+    def _key_mask(ends, keys, lo, hi):
+        """1.0 where the key is down for samples lo..hi of the timeline (0 outside it)."""
+        mask = np.zeros(hi - lo, dtype=np.float32)
+        first = np.searchsorted(ends, max(lo, 0), side="right")
+        last = np.searchsorted(ends, hi, side="left")
+        if first >= len(keys) or hi <= 0:
+            return mask
+        last = min(last, len(keys) - 1)
+        starts = np.concatenate([[0], ends[:-1]])[first:last + 1]
+        # Clip the segments to lo..hi and repeat their key state
+        lengths = np.minimum(ends[first:last + 1], hi) - np.maximum(starts, lo)
+        down = np.repeat(keys[first:last + 1] == KEY_DOWN, lengths)
+        begin = max(lo, 0) - lo
+        mask[begin:begin + len(down)] = down
+        return mask
+
+    def block(self, ends, keys, frequency, n0, n1, sample_rate=SAMPLE_RATE, offset=0):
+        """Samples n0..n1 (absolute) of a timeline whose segments end at `ends`
+        (sample positions relative to `offset`); float32 in -1..1."""
+        ramp = max(1, int(RAMP_SECONDS * sample_rate))
+        envelope = ramped(self._key_mask(ends, keys, n0 - offset - (ramp - 1), n1 - offset), ramp)
+
+        n = np.arange(n0, n1, dtype=np.int64)
+        t = n / sample_rate
+        coarse = np.arange(n0, n1 + CONTROL_STEP, CONTROL_STEP) / sample_rate
+        out = (SIGNAL_LEVEL * envelope * self._fading(t, coarse)
+               * np.sin(self._phase(frequency, t, coarse)).astype(np.float32))
+        for station in self.qrm:
+            qrm = self._qrm_envelope(station, sample_rate)
+            tone = np.sin(2 * np.pi * (frequency + station["offset_hz"]) * t + station["phase"])
+            out += (SIGNAL_LEVEL * station["gain"] * qrm[n % len(qrm)] * tone).astype(np.float32)
+        out += self._noise(n0, n1 - n0, sample_rate)
+        return out
+
+    def render(self, timeline, frequency, sample_rate=SAMPLE_RATE, start=0,
+               block_seconds=BLOCK_SECONDS, out=None):
+        """Render a compiled timeline starting at absolute sample `start`
+        to an int16 buffer (or into out, e.g. a memmap), block by block."""
+        lengths = timeline["samples"].astype(np.int64)
+        ends = np.cumsum(lengths)
+        total = int(ends[-1]) if len(ends) else 0
+        keys = timeline["key"]
+        buffer = np.empty(total, dtype=np.int16) if out is None else out
+        step = max(1, int(block_seconds * sample_rate))
+        for begin in range(0, total, step):
+            stop = min(total, begin + step)
+            block = self.block(ends, keys, frequency, start + begin, start + stop, sample_rate, start)
+            np.clip(block, -1.0, 1.0, out=block)
+            buffer[begin:stop] = (block * 32767).astype(np.int16)
+        return buffer
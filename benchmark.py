@@ -0,0 +1,465 @@
+"""Benchmarks for the Morse Code Trainer.
+
+Run from the project folder:
+
+    python benchmark.py                      # run and print
+    python benchmark.py --save base.json     # store a baseline
+    python benchmark.py --compare base.json  # fail on regressions
+
+The WPM and Farnsworth ranges follow the limits in settings_menu.
+Playback timing runs under the dummy SDL audio driver. The timing
+section is also a correctness check: it fails if long sends drift from
+their nominal length. So is the export section: it fails if the peak
+memory of a WAV export grows with the length of the output. The decode
+section fails if rendered text, clean or after a stretch of leading
+hiss, does not decode back to itself.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WPM_RANGE = (5, 10, 15, 20, 25, 30, 40, 50, 60)          # settings: 5-60
+FARNSWORTH_RANGE = (2.0, 5.0, 10.0, 20.0, 40.0)           # settings: 2-40
+PLAYBACK_WPM = (15, 30, 60)
+RENDER_RATES = (8000, 16000, 44100)
+RENDER_TEXT = "THE QUICK BROWN FOX JUMPS OVER LAZY DOG. PACK MY BOX WITH FIVE DOZEN LIQUOR JUGS? 1234567890 / WA7SPY"
+PLAYBACK_TEXT = "PARIS"
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import morsecode
+elapsed = time.perf_counter() - start
+loaded = [m for m in ("pygame", "pyttsx3") if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+EXPORT_PROBE = """
+import resource, sys, time
+import morsecode
+start = time.perf_counter()
+morsecode.main(sys.argv[1:])
+elapsed = time.perf_counter() - start
+scale = 1 if sys.platform == "darwin" else 1024
+own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+try:
+    # Linux carries ru_maxrss over from the process that started us; VmHWM starts fresh
+    with open("/proc/self/status") as f:
+        own = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+except OSError:
+    pass
+print(elapsed, max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale))
+"""
+EXPORT_RSS_GROWTH_MB = 8.0
+
+
+def metric(value, unit, better, slack=0.0):
+    """One result; slack is an absolute allowance for noisy tiny values."""
+    return {"value": value, "unit": unit, "better": better, "slack": slack}
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# === Import time ===
+def bench_import(runs=5):
+    """Time a cold `import morsecode` in fresh interpreters.
+
+    Each run uses an empty working folder so we can also check that the
+    import did not write a settings file or pull in audio/voice modules.
+    """
+    times = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cwd:
+            env = dict(os.environ, PYTHONPATH=HERE)
+            out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=cwd, env=env,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            if os.listdir(cwd):
+                raise AssertionError(f"import wrote files: {os.listdir(cwd)}")
+            if len(out) > 1:
+                raise AssertionError(f"import loaded {out[1]}")
+            times.append(float(out[0]))
+    times.sort()
+    return {"import_ms": metric(times[len(times) // 2] * 1000.0, "ms", "lower", slack=20.0)}
+
+
+# === Tone generation ===
+def bench_generate_tone(mc, wpm_range=WPM_RANGE):
+    """Seconds of dot+dash audio generated per second of wall time."""
+    results = {}
+    for wpm in wpm_range:
+        dot_s = mc.dot_duration_seconds(wpm)
+        elapsed = best_of(lambda: (mc.generate_tone(mc.current_frequency, dot_s),
+                                   mc.generate_tone(mc.current_frequency, dot_s * 3.0)))
+        results[f"tone_xrt_wpm{wpm}"] = metric(dot_s * 4.0 / elapsed, "x realtime", "higher")
+    return results
+
+
+# === Full-text render ===
+def bench_render(mc, wpm_range=WPM_RANGE, farnsworth_range=FARNSWORTH_RANGE):
+    """Seconds of rendered audio per second of wall time for RENDER_TEXT."""
+    results = {}
+    for wpm in wpm_range:
+        for fwpm in farnsworth_range:
+            buffer, _ = mc.render_text(RENDER_TEXT, mc.current_frequency, wpm, fwpm,
+                                       mc.farnsworth_gap_mult)
+            audio_s = len(buffer) / mc.SAMPLE_RATE
+            elapsed = best_of(lambda: mc.render_text(RENDER_TEXT, mc.current_frequency, wpm,
+                                                     fwpm, mc.farnsworth_gap_mult), repeat=3)
+            results[f"render_xrt_wpm{wpm}_f{fwpm:g}"] = metric(audio_s / elapsed, "x realtime", "higher")
+
+    # Lower audio sample rates (Settings > Audio Output): less work and memory per second
+    for rate in RENDER_RATES:
+        buffer, _ = mc.render_text(RENDER_TEXT, mc.current_frequency, 25, 10.0, mc.farnsworth_gap_mult, rate)
+        elapsed = best_of(lambda: mc.render_text(RENDER_TEXT, mc.current_frequency, 25, 10.0,
+                                                 mc.farnsworth_gap_mult, rate), repeat=3)
+        results[f"render_xrt_{rate}hz"] = metric(len(buffer) / rate / elapsed, "x realtime", "higher")
+
+    # Compiling a large text to the timeline array, without rendering audio
+    text = RENDER_TEXT * 2000
+    elapsed = best_of(lambda: mc.compile_timeline(text, 25, 10.0, mc.farnsworth_gap_mult), repeat=3)
+    results["compile_mchars_per_s"] = metric(len(text) / elapsed / 1e6, "Mchar/s", "higher")
+    return results
+
+
+# === Sample-exact timing ===
+def nominal_samples(mc, text, char_wpm, eff_wpm, mult, sample_rate):
+    """Exact length of text counted element by element (independent of the timeline code)."""
+    dot_s, intra, inter_char, inter_word = mc.space_durations(char_wpm, eff_wpm, mult)
+    seconds = 0.0
+    for char in text.upper():
+        if char == " ":
+            seconds += inter_word
+        elif char in mc.morse_code:
+            code = mc.morse_code[char]
+            seconds += sum(dot_s * (1 if s == "." else 3) for s in code)
+            seconds += intra * (len(code) - 1) + inter_char
+    return seconds * sample_rate
+
+
+def bench_timing(mc, minutes=60, settings=((23, 7.3, 1.37), (60, 2.0, 0.5), (13, 13.0, 1.0))):
+    """Check that long sends match their nominal length to the sample.
+
+    Each text is sized to about an hour, compiled whole and as export
+    segments; both must be within one sample of the exact nominal length.
+    """
+    results = {}
+    for char_wpm, eff_wpm, mult in settings:
+        sample_rate = mc.SAMPLE_RATE
+        unit = RENDER_TEXT + " "
+        per_unit = nominal_samples(mc, unit, char_wpm, eff_wpm, mult, sample_rate)
+        text = unit * max(1, int(minutes * 60 * sample_rate / per_unit))
+        nominal = nominal_samples(mc, text, char_wpm, eff_wpm, mult, sample_rate)
+        whole = int(mc.compile_timeline(text, char_wpm, eff_wpm, mult, sample_rate)["samples"].sum())
+        segmented = sum(
+            int(mc.compile_timeline(job[0], char_wpm, eff_wpm, mult, sample_rate, start=job[6])["samples"].sum())
+            for job in mc.export_jobs(text.split(), 0, char_wpm, eff_wpm, mult, sample_rate))
+        drift = max(abs(whole - nominal), abs(segmented - nominal))
+        if drift > 1.0:
+            raise AssertionError(f"{char_wpm}/{eff_wpm:g}/{mult:g}: {drift:.2f} samples off nominal")
+        results[f"drift_samples_wpm{char_wpm}_f{eff_wpm:g}_m{mult:g}"] = metric(drift, "samples", "lower", slack=1.0)
+    return results
+
+
+# === Audio decoder ===
+def bench_decode(mc, cases=((20, 20.0, 44100), (25, 8.0, 8000), (60, 60.0, 44100)),
+                 lead_seconds=2.0, hiss_db=-45.0):
+    """Decode speed, and round trips that must come back exact.
+
+    Each case is decoded clean, then with hiss before and under the send,
+    both at the known tone and with the tone left for the decoder to find.
+    """
+    import numpy as np
+    import decoder
+    text = "THE QUICK BROWN FOX JUMPS OVER LAZY DOG. " * 5
+    results = {}
+    for wpm, fwpm, rate in cases:
+        buffer, _ = mc.render_text(text, 600, wpm, fwpm, 2.0, rate)
+        lead = np.zeros(int(lead_seconds * rate))
+        signal = np.concatenate([lead, buffer])
+        hiss = np.random.default_rng(wpm).normal(0.0, 32767 * 10 ** (hiss_db / 20), len(signal))
+        noisy = np.clip(signal + hiss, -32768, 32767).astype(np.int16)
+        for name, samples, frequency in (("clean", buffer, None), ("hiss", noisy, 600),
+                                         ("hiss_auto", noisy, None)):
+            decoded, _ = decoder.decode_samples(samples, rate, frequency)
+            if decoded != text.strip():
+                raise AssertionError(f"{wpm}/{fwpm:g} at {rate} Hz, {name}: decoded {decoded[:60]!r}...")
+        elapsed = best_of(lambda: decoder.decode_samples(noisy, rate), repeat=3)
+        results[f"decode_xrt_wpm{wpm}_{rate}hz"] = metric(len(noisy) / rate / elapsed, "x realtime", "higher")
+    return results
+
+
+# === Long WAV export ===
+def bench_export(mc, minutes=(1, 120), jobs=2):
+    """Export texts of two lengths in fresh interpreters; compare peak RSS.
+
+    Samples go straight into the file through np.memmap, so the longer
+    export may not need more than EXPORT_RSS_GROWTH_MB of extra memory.
+    """
+    if sys.platform == "win32":
+        print("export: skipped (peak RSS needs the resource module)")
+        return {}
+    results = {}
+    peaks = []
+    unit = RENDER_TEXT + " "
+    per_unit = nominal_samples(mc, unit, 25, 10.0, 2.0, mc.SAMPLE_RATE)
+    for length in minutes:
+        with tempfile.TemporaryDirectory() as cwd:
+            with open(os.path.join(cwd, "text.txt"), "w") as f:
+                f.write(unit * max(1, int(length * 60 * mc.SAMPLE_RATE / per_unit)))
+            args = ["export", "--in", "text.txt", "--out", "out.wav", "--wpm", "25", "--fwpm", "10",
+                    "--gap-mult", "2", "--sample-rate", str(mc.SAMPLE_RATE), "--jobs", str(jobs),
+                    "--conditions", "off"]
+            env = dict(os.environ, PYTHONPATH=HERE)
+            out = subprocess.run([sys.executable, "-c", EXPORT_PROBE, *args], cwd=cwd, env=env,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            elapsed, peak = float(out[-2]), int(out[-1]) / 2 ** 20
+            size = os.path.getsize(os.path.join(cwd, "out.wav"))
+        peaks.append(peak)
+        audio_s = (size - mc.WAV_HEADER_BYTES) / 2 / mc.SAMPLE_RATE
+        results[f"export_xrt_{length}min"] = metric(audio_s / elapsed, "x realtime", "higher")
+        results[f"export_peak_rss_{length}min_mb"] = metric(peak, "MB", "lower", slack=4.0)
+    growth = peaks[-1] - peaks[0]
+    if growth > EXPORT_RSS_GROWTH_MB:
+        raise AssertionError(f"export peak RSS grew {growth:.1f} MB from {minutes[0]} to {minutes[-1]} min")
+    results["export_rss_growth_mb"] = metric(growth, "MB", "lower", slack=EXPORT_RSS_GROWTH_MB)
+    return results
+
+
+# === Band conditions ===
+def bench_conditions(mc, presets=("light", "moderate", "heavy")):
+    """Seconds of band-conditions audio rendered per second of wall time."""
+    import band_conditions
+    timeline = mc.compile_timeline(RENDER_TEXT, 25, 25.0, 1.0)
+    audio_s = timeline["samples"].sum() / mc.SAMPLE_RATE
+    results = {}
+    for name in presets:
+        simulator = band_conditions.conditions(name, seed=1)
+        elapsed = best_of(lambda: simulator.render(timeline, mc.current_frequency), repeat=3)
+        results[f"conditions_xrt_{name}"] = metric(audio_s / elapsed, "x realtime", "higher")
+    return results
+
+
+# === Pileup mixing ===
+def bench_pileup(mc, counts=(5, 50)):
+    """Pileup render speed, and how many all-keyed stations one core mixes in real time."""
+    import random
+    import pileup
+    results = {}
+    for count in counts:
+        mix = pileup.Pileup.random(count, mc.current_frequency, rng=random.Random(count))
+        elapsed = best_of(lambda: [None for _ in mix.blocks()], repeat=3)
+        results[f"pileup_xrt_{count}_stations"] = metric(mix.total / mc.SAMPLE_RATE / elapsed,
+                                                         "x realtime", "higher")
+    results["pileup_realtime_stations"] = metric(pileup.realtime_capacity(mc.current_frequency),
+                                                 "stations", "higher")
+    return results
+
+
+# === Flash card display ===
+def bench_flash_card(runs=20000):
+    import ascii_letters
+    chars = [c for c in ascii_letters.ASCII_ART if c != " "]
+    elapsed = best_of(lambda: [ascii_letters.ascii_letter(chars[i % len(chars)]) for i in range(runs)])
+    results = {"ascii_letter_us": metric(elapsed / runs * 1e6, "us/char", "lower", slack=0.5)}
+
+    words = RENDER_TEXT.split()
+    ascii_letters.ascii_banner.cache_clear()
+    start = time.perf_counter()
+    for word in words:
+        ascii_letters.ascii_banner(word)
+    results["ascii_banner_cold_us"] = metric((time.perf_counter() - start) / len(words) * 1e6,
+                                             "us/word", "lower", slack=50.0)
+    return results
+
+
+# === Reference element player ===
+# The player the app used before the session engine: one cached Sound per
+# dot/dash, each started on an absolute deadline. Kept here only as the
+# baseline the session engine's playback timing is measured against.
+SPIN_NS = 1_000_000          # busy-wait the last 1 ms for a precise wakeup
+MAX_CATCHUP_NS = 5_000_000   # further behind than this, restart the timeline
+
+
+class Deadlines:
+    """Timeline of absolute deadlines built on time.monotonic_ns().
+
+    Each wait extends the previous deadline instead of sleeping for a
+    duration, so late wakeups shorten the next wait rather than adding up.
+    """
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.start()
+
+    def start(self):
+        self.deadline_ns = time.monotonic_ns()
+        self.recorder.start()
+
+    def wait(self, duration_seconds):
+        self.deadline_ns += int(round(duration_seconds * 1e9))
+        remaining_ns = self.deadline_ns - time.monotonic_ns()
+        if remaining_ns > SPIN_NS:
+            time.sleep((remaining_ns - SPIN_NS) / 1e9)
+        while time.monotonic_ns() < self.deadline_ns:
+            pass
+        late_ns = time.monotonic_ns() - self.deadline_ns
+        self.recorder.record(late_ns)
+        if late_ns > MAX_CATCHUP_NS:
+            # Too far behind to catch up without overlapping tones
+            self.deadline_ns += late_ns
+
+
+def play_elements(mc, deadlines, letter):
+    code = mc.morse_code.get(letter, '')
+    dot_s, intra_gap, _, _ = mc.timing_now()
+    dot_sound, dash_sound = mc.element_sounds(mc.current_frequency, mc.current_wpm, mc.output_rate)
+    for i, symbol in enumerate(code):
+        (dash_sound if symbol == '-' else dot_sound).play()
+        deadlines.wait(dot_s * (3.0 if symbol == '-' else 1.0))
+        if i < len(code) - 1:
+            deadlines.wait(intra_gap)
+
+
+def play_chars(mc, deadlines, text):
+    _, _, inter_char_gap, inter_word_gap = mc.timing_now()
+    for char in text.upper():
+        if char == ' ':
+            deadlines.wait(inter_word_gap)
+        elif char in mc.morse_code:
+            mc.show_letter(char)
+            play_elements(mc, deadlines, char)
+            deadlines.wait(inter_char_gap)
+
+
+# === Playback timing ===
+def bench_playback(mc, wpm_range=PLAYBACK_WPM):
+    """End-to-end timing error of the element path and the session engine."""
+    mc.ensure_audio("dummy")
+    mc.flash_card_mode_enabled = False
+    mc.voice_enabled = False
+    results = {}
+    for wpm in wpm_range:
+        mc.current_wpm = wpm
+        mc.farnsworth_wpm = float(wpm)
+        buffer, _ = mc.render_text(PLAYBACK_TEXT, mc.current_frequency, wpm, wpm,
+                                   mc.farnsworth_gap_mult)
+        nominal = len(buffer) / mc.SAMPLE_RATE
+        deadlines = Deadlines(mc.LatenessRecorder())
+        for name, play, recorder in (("element", lambda text: play_chars(mc, deadlines, text),
+                                      deadlines.recorder),
+                                     ("session", mc.play_text, mc.lateness)):
+            mc.element_sounds(mc.current_frequency, wpm, mc.output_rate)
+            deadlines.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                play(PLAYBACK_TEXT)
+                elapsed = time.perf_counter() - start
+            stats = recorder.summary()
+            results[f"play_{name}_wpm{wpm}_error_ms"] = metric(
+                abs(elapsed - nominal) * 1000.0, "ms", "lower", slack=2.0)
+            results[f"play_{name}_wpm{wpm}_p95_late_ms"] = metric(
+                stats["p95_ms"], "ms", "lower", slack=0.5)
+    return results
+
+
+# === Baselines ===
+def compare(results, baseline, tolerance):
+    """Return a list of regressions against a saved baseline."""
+    regressions = []
+    for name, old in baseline.items():
+        new = results.get(name)
+        if new is None:
+            continue
+        if old["better"] == "higher":
+            limit = old["value"] * (1.0 - tolerance) - old.get("slack", 0.0)
+            bad = new["value"] < limit
+        else:
+            limit = old["value"] * (1.0 + tolerance) + old.get("slack", 0.0)
+            bad = new["value"] > limit
+        if bad:
+            regressions.append(f"{name}: {new['value']:.3f} {new['unit']} "
+                               f"(baseline {old['value']:.3f}, limit {limit:.3f})")
+    return regressions
+
+
+SECTIONS = ("import", "tone", "render", "timing", "decode", "export", "conditions", "pileup", "flash", "playback")
+
+
+def run(sections, quick=False):
+    sys.path.insert(0, HERE)
+    import morsecode as mc
+
+    wpm_range = (5, 25, 60) if quick else WPM_RANGE
+    results = {}
+    if "import" in sections:
+        results.update(bench_import(runs=3 if quick else 5))
+    if "tone" in sections:
+        results.update(bench_generate_tone(mc, wpm_range))
+    if "render" in sections:
+        results.update(bench_render(mc, wpm_range, (2.0, 40.0) if quick else FARNSWORTH_RANGE))
+    if "timing" in sections:
+        results.update(bench_timing(mc, minutes=10 if quick else 60))
+    if "decode" in sections:
+        results.update(bench_decode(mc))
+    if "export" in sections:
+        results.update(bench_export(mc, (1, 30) if quick else (1, 120)))
+    if "conditions" in sections:
+        results.update(bench_conditions(mc, ("heavy",) if quick else ("light", "moderate", "heavy")))
+    if "pileup" in sections:
+        results.update(bench_pileup(mc))
+    if "flash" in sections:
+        results.update(bench_flash_card())
+    if "playback" in sections:
+        results.update(bench_playback(mc, (60,) if quick else PLAYBACK_WPM))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Morse Code Trainer benchmarks")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--quick", action="store_true", help="fewer WPM points")
+    parser.add_argument("--save", metavar="JSON", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown before failing (default 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.quick)
+    for name, r in results.items():
+        print(f"{name:>36}: {r['value']:14.3f} {r['unit']}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Rule-based call-sign generator for the Morse Code Trainer.
+
+Calls are built from a prefix, a region digit and a 1-3 letter suffix,
+with the occasional /P, /M, /MM or /QRP. A large pool is generated up
+front (vectorized, deduplicated) and kept as one uint64 per call: each
+character is a base-38 digit, so a call of up to 12 characters fits in
+8 bytes. The pool is shuffled once and drawn from in order, so draws are
+O(1) and a call never repeats until the whole pool has been used.
+"""
+import random
+
+import numpy as np
+
+SYMBOLS = " ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/"     # index 0 pads
+BASE = len(SYMBOLS)
+MAX_LENGTH = 12                                       # 38**12 < 2**64
+POOL_SIZE = 200_000
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# (prefixes, relative weight of the group); US calls dominate on the air
+PREFIX_GROUPS = [
+    (["K", "N", "W"], 30),
+    (["K" + c for c in LETTERS] + ["N" + c for c in LETTERS] + ["W" + c for c in LETTERS], 35),
+    (["A" + c for c in "ABCDEFGHIJKL"], 5),
+    (["VE", "VA", "G", "M", "F", "I", "DL", "EA", "PA", "ON", "OH", "SM", "LA", "OZ", "EI",
+      "GM", "GW", "HB", "OE", "SP", "OK", "HA", "YO", "LZ", "9A", "S5", "UA", "UR", "JA",
+      "VK", "ZL", "ZS", "PY", "LU", "XE"], 30),
+]
+PORTABLE = [("", 88), ("/P", 4), ("/M", 4), ("/QRP", 3), ("/MM", 1)]
+
+
+def encode(call):
+    """uint64-sized integer for a call of up to MAX_LENGTH symbols."""
+    code = 0
+    for char in call.upper():
+        code = code * BASE + SYMBOLS.index(char)
+    return code
+
+
+def decode(code):
+    code = int(code)
+    chars = []
+    while code:
+        code, symbol = divmod(code, BASE)
+        chars.append(SYMBOLS[symbol])
+    return "".join(reversed(chars))
+
+
+def symbol_table(strings):
+    """(symbols, lengths): strings as a padded matrix of symbol indices."""
+    width = max(len(s) for s in strings) or 1
+    symbols = np.zeros((len(strings), width), dtype=np.uint64)
+    for i, s in enumerate(strings):
+        symbols[i, :len(s)] = [SYMBOLS.index(c) for c in s]
+    return symbols, np.array([len(s) for s in strings])
+
+
+def generate_codes(count, rng):
+    """count random calls (possibly with repeats) as uint64 codes."""
+    prefixes = [p for group, _ in PREFIX_GROUPS for p in group]
+    weights = np.array([w / len(group) for group, w in PREFIX_GROUPS for _ in group])
+    prefix_symbols, prefix_lengths = symbol_table(prefixes)
+    portable_symbols, portable_lengths = symbol_table([p for p, _ in PORTABLE])
+    portable_weights = np.array([w for _, w in PORTABLE], dtype=float)
+
+    prefix = rng.choice(len(prefixes), count, p=weights / weights.sum())
+    # One-letter prefixes (K1ABC) take 2-3 letter suffixes; others 1-3
+    suffix_length = np.where(prefix_lengths[prefix] == 1,
+                             rng.integers(2, 4, count), rng.integers(1, 4, count))
+    portable = rng.choice(len(PORTABLE), count, p=portable_weights / portable_weights.sum())
+
+    # Append symbol columns; a column only counts where that row has a symbol there
+    codes = np.zeros(count, dtype=np.uint64)
+    base = np.uint64(BASE)
+    for j in range(prefix_symbols.shape[1]):
+        codes = np.where(j < prefix_lengths[prefix], codes * base + prefix_symbols[prefix, j], codes)
+    codes = codes * base + (SYMBOLS.index("0") + rng.integers(0, 10, count)).astype(np.uint64)
+    for j in range(3):
+        letter = (1 + rng.integers(0, 26, count)).astype(np.uint64)
+        codes = np.where(j < suffix_length, codes * base + letter, codes)
+    for j in range(portable_symbols.shape[1]):
+        codes = np.where(j < portable_lengths[portable], codes * base + portable_symbols[portable, j], codes)
+    return codes
+
+
+class CallSignPool:
+    """Shuffled, deduplicated calls drawn in order: O(1), no repeats."""
+
+    def __init__(self, size=POOL_SIZE, seed=None):
+        rng = np.random.default_rng(seed)
+        codes = np.unique(generate_codes(size + size // 4, rng))     # ~15% are repeats
+        while len(codes) < size:
+            codes = np.unique(np.concatenate([codes, generate_codes(size - len(codes) + 1024, rng)]))
+        self.codes = rng.permutation(codes)[:size]
+        self.rng = rng
+        self.next = 0
+
+    def __len__(self):
+        return len(self.codes)
+
+    def draw(self):
+        if self.next >= len(self.codes):
+            # Every call has been used; start a new shuffled round
+            self.codes = self.rng.permutation(self.codes)
+            self.next = 0
+        code = self.codes[self.next]
+        self.next += 1
+        return decode(code)
+
+    def draw_many(self, count):
+        return [self.draw() for _ in range(count)]
+
+
+_session_pool = None
+
+def session_pool():
+    """The pool shared by every drill, quiz, pileup and export in this process."""
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = CallSignPool(seed=random.randrange(2 ** 32))
+    return _session_pool
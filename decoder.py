@@ -0,0 +1,272 @@
+"""Audio Morse decoder for the Morse Code Trainer.
+
+Decodes int16 or float sample buffers (such as generate_tone output or an
+exported lesson) back to text:
+
+1. Tone energy is measured per short block with a single-bin DFT
+   (Goertzel-equivalent), vectorized over all blocks of a chunk.
+2. An adaptive threshold between the noise floor and the recent peak turns
+   the energy into key-down / key-up runs. Nothing is keyed until a
+   sustained tone stands well above the noise floor, so hiss before the
+   first tone is not mistaken for marks.
+3. The dot length (and so the WPM) and the inter-character gap are
+   estimated from recent runs, which copes with Farnsworth spacing.
+4. Runs are mapped back through morse_code.
+
+Input is processed in fixed-size chunks, so memory does not grow with
+the recording and hour-long files decode much faster than real time.
+"""
+import wave
+from collections import deque
+
+import numpy as np
+
+from morsecode import SAMPLE_RATE, letters_by_code
+
+BLOCK_SECONDS = 0.004       # energy resolution; a 60 WPM dot is 5 blocks
+CHUNK_SECONDS = 1.0         # samples processed per vectorized step
+PEAK_HALF_LIFE = 5.0        # seconds for the tracked peak to decay by half
+MIN_SNR = 4.0               # peak/floor ratio below which nothing is keyed
+GATE_SNR = 8.0              # the first tone must stand this far above the floor...
+GATE_SECONDS = 0.016        # ...for this long (under a 60 WPM dot)
+PEAK_PROMINENCE = 10.0      # a tone's spectral peak over the band's median
+HISTORY = 64                # recent marks and gaps used for estimates
+LOOKAHEAD_GAPS = 6          # letter/word gaps held back before deciding
+FREQ_RANGE = (200.0, 2000.0)
+
+
+def estimate_frequency(samples, sample_rate=SAMPLE_RATE):
+    """Strongest frequency in FREQ_RANGE, or None for silence or noise without a clear tone."""
+    samples = np.asarray(samples, dtype=np.float64)
+    if len(samples) < 256 or not np.any(samples):
+        return None
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    freqs = np.fft.rfftfreq(len(samples), 1.0 / sample_rate)
+    band = (freqs >= FREQ_RANGE[0]) & (freqs <= FREQ_RANGE[1])
+    peak = int(np.argmax(spectrum[band]))
+    # Hiss has a highest bin too; only a narrowband peak far above the rest is a tone
+    if spectrum[band][peak] < PEAK_PROMINENCE * max(float(np.median(spectrum[band])), 1e-12):
+        return None
+    return float(freqs[band][peak])
+
+
+class StreamDecoder:
+    """Incremental decoder; feed() sample chunks, then finish()."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frequency=None):
+        self.sample_rate = sample_rate
+        self.frequency = frequency
+        self.block_len = max(16, int(round(sample_rate * BLOCK_SECONDS)))
+        self.block_s = self.block_len / sample_rate
+        self.leftover = np.zeros(0, dtype=np.float32)
+        self.peak = 0.0
+        self.floor = None
+        self.gate_blocks = max(1, int(np.ceil(GATE_SECONDS / self.block_s)))
+        self.opened = False         # set once the first sustained tone is seen
+        self.pending = np.zeros(0, dtype=np.float32)    # energy held back while closed
+        self.key_down = False
+        self.run_blocks = 0
+        self.runs = []              # pending (key_down, seconds)
+        self.marks = deque(maxlen=HISTORY)
+        self.gaps = deque(maxlen=2 * HISTORY)
+        self.dot_s = None
+        self.symbol = ""
+        self.text = []
+        self._basis = None
+
+    # === Energy and keying ===
+    def _basis_for(self, frequency):
+        n = np.arange(self.block_len)
+        phase = 2.0 * np.pi * frequency * n / self.sample_rate
+        return np.stack([np.cos(phase), np.sin(phase)], axis=1).astype(np.float32)
+
+    def _energy(self, blocks):
+        parts = blocks @ self._basis
+        return np.hypot(parts[:, 0], parts[:, 1]) * (2.0 / self.block_len)
+
+    def _track_floor(self, energy):
+        floor = float(np.percentile(energy, 10))
+        self.floor = floor if self.floor is None else min(floor, 0.9 * self.floor + 0.1 * floor)
+
+    def _open_gate(self, energy):
+        """energy from the first sustained tone on (None while there is none yet).
+
+        The floor is tracked across chunks; a tone must stay GATE_SNR above
+        it for gate_blocks in a row, which hiss practically never does.
+        """
+        energy = np.concatenate([self.pending, energy])
+        self._track_floor(energy)
+        loud = (energy > GATE_SNR * max(self.floor, 1e-9)).astype(np.int8)
+        # Length of the loud streak ending at each block
+        streak = np.arange(len(loud)) - np.maximum.accumulate(
+            np.where(loud == 0, np.arange(len(loud)), -1))
+        sustained = np.flatnonzero(streak >= self.gate_blocks)
+        if not len(sustained):
+            # A tone may be starting at the end of this chunk
+            self.pending = energy[-(self.gate_blocks - 1):] if self.gate_blocks > 1 else energy[:0]
+            return None
+        start = int(sustained[0]) - self.gate_blocks + 1
+        self.opened = True
+        self.pending = energy[:0]
+        return energy[start:]
+
+    def _key(self, energy):
+        chunk_s = len(energy) * self.block_s
+        self.peak = max(self.peak * 0.5 ** (chunk_s / PEAK_HALF_LIFE), float(energy.max()))
+        self._track_floor(energy)
+        if self.peak < MIN_SNR * max(self.floor, 1e-9):
+            return np.zeros(len(energy), dtype=bool)
+        return energy > self.floor + 0.5 * (self.peak - self.floor)
+
+    def feed(self, samples) -> str:
+        """Decode another chunk of samples; returns newly decoded text."""
+        samples = np.asarray(samples)
+        if samples.dtype.kind in "iu":
+            samples = samples.astype(np.float32) / 32768.0
+        samples = np.concatenate([self.leftover, samples.astype(np.float32, copy=False)])
+        if self._basis is None:
+            if self.frequency is None:
+                # Only the latest second is kept until a clear tone shows up in it
+                self.frequency = estimate_frequency(samples[-self.sample_rate:], self.sample_rate)
+                if self.frequency is None:
+                    self.leftover = samples[-self.sample_rate:]
+                    return ""
+            self._basis = self._basis_for(self.frequency)
+
+        count = len(samples) // self.block_len
+        self.leftover = samples[count * self.block_len:]
+        if count == 0:
+            return ""
+        energy = self._energy(samples[: count * self.block_len].reshape(count, self.block_len))
+        if not self.opened:
+            energy = self._open_gate(energy)
+            if energy is None:
+                return ""
+        self._add_runs(self._key(energy))
+        return self._decode(final=False)
+
+    def finish(self) -> str:
+        """Flush the last run and everything held back; returns the remaining text."""
+        if self.run_blocks:
+            self._add_run(self.key_down, self.run_blocks * self.block_s)
+            self.run_blocks = 0
+        return self._decode(final=True)
+
+    def _add_runs(self, keyed):
+        # Indices where the key state changes, as run boundaries
+        edges = np.flatnonzero(keyed[1:] != keyed[:-1]) + 1
+        starts = np.concatenate([[0], edges])
+        lengths = np.diff(np.concatenate([starts, [len(keyed)]]))
+        for start, length in zip(starts, lengths):
+            state = bool(keyed[start])
+            if state == self.key_down:
+                self.run_blocks += int(length)
+            else:
+                self._add_run(self.key_down, self.run_blocks * self.block_s)
+                self.key_down = state
+                self.run_blocks = int(length)
+
+    def _add_run(self, down, seconds):
+        if down:
+            self.marks.append(seconds)
+        elif not self.marks:
+            return                      # silence before the first mark
+        else:
+            self.gaps.append(seconds)
+        self.runs.append((down, seconds))
+
+    # === Timing estimates ===
+    def _update_dot(self):
+        marks = np.array(self.marks)
+        shortest, longest = marks.min(), marks.max()
+        if longest > 2.0 * shortest:
+            split = np.sqrt(shortest * longest)
+            dots, dashes = marks[marks < split], marks[marks >= split]
+            self.dot_s = (dots.sum() + dashes.sum() / 3.0) / len(marks)
+        elif self.dot_s is None:
+            self.dot_s = float(marks.mean())   # only one kind seen yet; assume dots
+        # The threshold shortens marks and lengthens gaps by the same amount,
+        # so averaging with the gaps inside letters removes the bias
+        gaps = np.array(self.gaps)
+        intra = gaps[gaps < 2.0 * self.dot_s]
+        if len(intra):
+            self.dot_s = (self.dot_s + float(intra.mean())) / 2.0
+
+    def _char_gap(self, long_gap):
+        # Most long gaps separate letters, so a low percentile is a letter gap.
+        # Word gaps are 7/3 of it, with or without Farnsworth stretching.
+        gaps = np.array(self.gaps)
+        gaps = gaps[gaps >= long_gap]
+        return float(np.percentile(gaps, 20)) if len(gaps) else 3.0 * self.dot_s
+
+    # === Runs to text ===
+    def _decode(self, final) -> str:
+        if not self.marks:
+            return ""
+        self._update_dot()
+        long_gap = 2.0 * self.dot_s
+        ready = len(self.runs)
+        if not final:
+            # Hold runs back until enough later gaps are known to classify them
+            ready, seen = 0, 0
+            for i in range(len(self.runs) - 1, -1, -1):
+                down, seconds = self.runs[i]
+                if not down and seconds >= long_gap:
+                    seen += 1
+                    if seen > LOOKAHEAD_GAPS:
+                        ready = i + 1
+                        break
+        word_gap = self._char_gap(long_gap) * 5.0 / 3.0
+        out = []
+        for down, seconds in self.runs[:ready]:
+            if down:
+                self.symbol += "-" if seconds >= long_gap else "."
+            elif seconds >= long_gap:
+                out.append(self._end_symbol())
+                if seconds > word_gap:
+                    out.append(" ")
+        del self.runs[:ready]
+        if final:
+            out.append(self._end_symbol())
+        text = "".join(out)
+        self.text.append(text)
+        return text
+
+    def _end_symbol(self) -> str:
+        letter = letters_by_code.get(self.symbol, "*") if self.symbol else ""
+        self.symbol = ""
+        return letter
+
+    @property
+    def wpm(self):
+        return 1.2 / self.dot_s if self.dot_s else None
+
+
+def decode_samples(samples, sample_rate=SAMPLE_RATE, frequency=None):
+    """Decode a whole buffer; returns (text, estimated WPM)."""
+    decoder = StreamDecoder(sample_rate, frequency)
+    step = int(sample_rate * CHUNK_SECONDS)
+    for start in range(0, len(samples), step):
+        decoder.feed(samples[start:start + step])
+    decoder.finish()
+    return "".join(decoder.text).strip(), decoder.wpm
+
+
+def decode_wav(path, frequency=None):
+    """Decode a 16-bit PCM WAV file chunk by chunk; returns (text, estimated WPM)."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError("only 16-bit PCM WAV files are supported")
+        channels = f.getnchannels()
+        decoder = StreamDecoder(f.getframerate(), frequency)
+        step = int(f.getframerate() * CHUNK_SECONDS)
+        while True:
+            frames = f.readframes(step)
+            if not frames:
+                break
+            samples = np.frombuffer(frames, dtype="<i2")
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            decoder.feed(samples)
+    decoder.finish()
+    return "".join(decoder.text).strip(), decoder.wpm
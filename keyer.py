@@ -0,0 +1,238 @@
+"""Sending practice for the Morse Code Trainer.
+
+The keyboard is the key: Space works as a straight key, or two keys work
+as iambic paddles. Key-down and key-up times are taken from the monotonic
+clock as pygame delivers the events (a terminal cannot report key-up), the
+sidetone is started and stopped on a reserved mixer channel, and what is
+sent is decoded live with a dot length that adapts to the sender.
+
+Run it through morsecode.sending_practice(), which reopens the mixer with
+a small buffer so the sidetone follows the key within a few milliseconds.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from morsecode import dot_duration_seconds, letters_by_code
+
+STRAIGHT_KEYS = (pygame.K_SPACE,)
+DIT_KEYS = (pygame.K_z, pygame.K_LCTRL)
+DAH_KEYS = (pygame.K_x, pygame.K_RCTRL)
+QUIT_KEYS = (pygame.K_ESCAPE,)
+
+ALPHA = 0.2                 # EWMA weight of the newest element for the dot length
+WPM_LIMITS = (5, 60)        # same range as the settings menu
+LETTER_GAP_DOTS = 2.0       # idle time that ends a letter (between 1 and 3 dots)
+WORD_GAP_DOTS = 5.0         # idle time that ends a word (between 3 and 7 dots)
+FADE_MS = 4                 # sidetone attack/release against key clicks
+POLL_MS = 1
+HEADLESS_DRIVERS = ("dummy", "offscreen")
+
+
+class KeyDecoder:
+    """Turns live key timings into text, adapting the dot length as it goes."""
+
+    def __init__(self, wpm):
+        self.dot_ns = dot_duration_seconds(wpm) * 1e9
+        self.min_dot_ns = dot_duration_seconds(WPM_LIMITS[1]) * 1e9
+        self.max_dot_ns = dot_duration_seconds(WPM_LIMITS[0]) * 1e9
+        self.symbol = ""
+        self.spaced = True          # no space before the first word
+
+    def _adapt(self, dot_ns):
+        self.dot_ns += ALPHA * (dot_ns - self.dot_ns)
+        self.dot_ns = min(max(self.dot_ns, self.min_dot_ns), self.max_dot_ns)
+
+    def mark(self, down_ns):
+        """A key-down lasting down_ns: a dot or a dash."""
+        if down_ns < 2.0 * self.dot_ns:
+            self.symbol += "."
+            self._adapt(down_ns)
+        else:
+            self.symbol += "-"
+            self._adapt(down_ns / 3.0)
+
+    def key_down(self, gap_ns) -> str:
+        """The key went down after gap_ns of silence; returns text it completes."""
+        text = self.idle(gap_ns)
+        if self.symbol and gap_ns < LETTER_GAP_DOTS * self.dot_ns:
+            self._adapt(gap_ns)     # the gap between elements is one dot
+        return text
+
+    def idle(self, gap_ns) -> str:
+        """Called while the key is up; ends the letter or word once the gap is long enough."""
+        text = ""
+        if self.symbol and gap_ns >= LETTER_GAP_DOTS * self.dot_ns:
+            text = letters_by_code.get(self.symbol, "*")
+            self.symbol = ""
+            self.spaced = False
+        if not self.symbol and not self.spaced and gap_ns >= WORD_GAP_DOTS * self.dot_ns:
+            text += " "
+            self.spaced = True
+        return text
+
+    def flush(self) -> str:
+        text = letters_by_code.get(self.symbol, "*") if self.symbol else ""
+        self.symbol = ""
+        return text
+
+    @property
+    def wpm(self):
+        return 1.2e9 / self.dot_ns
+
+
+def sidetone_loop(frequency, sample_rate):
+    """One second of tone; a whole number of cycles, so it loops without a click."""
+    cycles = max(1, round(frequency))
+    t = np.arange(sample_rate) / sample_rate
+    return np.int16(np.sin(2 * np.pi * cycles * t) * 32767 * 0.8)
+
+
+class Keyer:
+    """Key state, sidetone and decoding for one sending session.
+
+    handle() takes key events and tick() is called between them; both get
+    the monotonic time in ns so the logic can be driven without a window.
+    """
+
+    def __init__(self, mode, wpm, frequency, elements):
+        sample_rate = pygame.mixer.get_init()[0]
+        self.mode = mode
+        self.dot_ns = int(dot_duration_seconds(wpm) * 1e9)
+        self.decoder = KeyDecoder(wpm)
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.tone = pygame.sndarray.make_sound(sidetone_loop(frequency, sample_rate))
+        self.elements = dict(zip(".-", elements))
+        self.down_at = None         # straight key: when it went down
+        self.up_at = None           # when the last element ended
+        self.dit_held = self.dah_held = False
+        self.dit_memory = self.dah_memory = False
+        self.free_at = 0            # iambic: when the next element may start
+        self.last_element = None
+        self.text = []
+
+    def _out(self, text):
+        if text:
+            self.text.append(text)
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def handle(self, event, now_ns):
+        if self.mode == "straight":
+            if event.key not in STRAIGHT_KEYS:
+                return
+            if event.type == pygame.KEYDOWN and self.down_at is None:
+                self.channel.play(self.tone, loops=-1, fade_ms=FADE_MS)
+                self.down_at = now_ns
+                if self.up_at is not None:
+                    self._out(self.decoder.key_down(now_ns - self.up_at))
+            elif event.type == pygame.KEYUP and self.down_at is not None:
+                self.channel.fadeout(FADE_MS)
+                self.decoder.mark(now_ns - self.down_at)
+                self.down_at = None
+                self.up_at = now_ns
+        else:
+            down = event.type == pygame.KEYDOWN
+            busy = now_ns < self.free_at
+            if event.key in DIT_KEYS:
+                self.dit_held = down
+                self.dit_memory |= down and busy
+            elif event.key in DAH_KEYS:
+                self.dah_held = down
+                self.dah_memory |= down and busy
+            self.tick(now_ns)
+
+    def tick(self, now_ns):
+        if self.mode == "iambic" and now_ns >= self.free_at:
+            dit = self.dit_held or self.dit_memory
+            dah = self.dah_held or self.dah_memory
+            if dit and dah:
+                element = "." if self.last_element == "-" else "-"
+            else:
+                element = "." if dit else "-" if dah else None
+            if element is not None:
+                self.dit_memory = self.dah_memory = False
+                self._send(element, now_ns)
+                return
+        if self.down_at is None and self.up_at is not None and now_ns >= self.up_at:
+            self._out(self.decoder.idle(now_ns - self.up_at))
+
+    def _send(self, element, now_ns):
+        # Back-to-back elements start from the previous deadline, not from
+        # when this poll happened, so polling jitter does not accumulate
+        start = self.free_at if now_ns - self.free_at < self.dot_ns else now_ns
+        length = self.dot_ns * (1 if element == "." else 3)
+        self.channel.play(self.elements[element])
+        if self.up_at is not None:
+            self._out(self.decoder.key_down(start - self.up_at))
+        self.decoder.mark(length)
+        self.up_at = start + length
+        self.free_at = self.up_at + self.dot_ns
+        self.last_element = element
+
+    def finish(self):
+        self.channel.stop()
+        self._out(self.decoder.flush())
+        return "".join(self.text).strip()
+
+
+def open_window():
+    """A small window to receive key events; None if there is no display."""
+    # init_audio defaults the video driver to "dummy", which never sees keys
+    if os.environ.get("SDL_VIDEODRIVER") == "dummy":
+        pygame.display.quit()
+        del os.environ["SDL_VIDEODRIVER"]
+    try:
+        pygame.display.init()
+        if pygame.display.get_driver() in HEADLESS_DRIVERS:
+            raise pygame.error("no display available")
+        window = pygame.display.set_mode((480, 120))
+    except pygame.error as e:
+        print(f"Sending practice needs a window for key up/down events: {e}")
+        close_window()
+        return None
+    pygame.key.set_repeat()         # held keys must not repeat
+    return window
+
+
+def close_window():
+    pygame.display.quit()
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+
+
+def run_keyer(mode, wpm, frequency, elements):
+    """Sending practice until Esc or the window is closed.
+
+    elements are the (dot, dash) Sounds from morsecode.element_sounds.
+    """
+    if open_window() is None:
+        return ""
+    keyer = Keyer(mode, wpm, frequency, elements)
+    caption = "Morse sending practice - Esc to finish"
+    pygame.display.set_caption(caption)
+    print("\nSend with the " + ("Space bar." if mode == "straight" else
+                                "Z / Left Ctrl (dit) and X / Right Ctrl (dah) keys."))
+    print("Keep the Morse window focused. Press Esc there to finish.\n")
+    try:
+        running = True
+        while running:
+            event = pygame.event.wait(POLL_MS)
+            while event.type != pygame.NOEVENT:
+                now_ns = time.monotonic_ns()
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in QUIT_KEYS):
+                    running = False
+                elif event.type in (pygame.KEYDOWN, pygame.KEYUP):
+                    keyer.handle(event, now_ns)
+                event = pygame.event.poll()
+            keyer.tick(time.monotonic_ns())
+    finally:
+        text = keyer.finish()
+        close_window()
+    print(f"\n\nYou sent: {text}")
+    print(f"Your speed: about {keyer.decoder.wpm:.0f} WPM")
+    return text
@@ -0,0 +1,260 @@
+"""Lesson-pack builder for the Morse Code Trainer.
+
+A curriculum spec (JSON) lists lessons and the speeds to render them at.
+Every lesson/speed pair becomes a WAV file, an answer-key text file and
+an entry in manifest.json. Lessons are rendered across a process pool.
+
+Builds are incremental: each entry is identified by a hash of its text
+and everything that shapes its audio (speeds, gap multiplier, tone,
+sample rate, band conditions). A lesson whose hash is already in the
+manifest, with both files present, is not rendered again.
+
+Spec format (every top-level setting can be overridden per lesson):
+
+    {
+      "frequency": 600, "gap_mult": 2.0, "sample_rate": 44100,
+      "conditions": "off",
+      "speeds": [{"wpm": 20, "fwpm": 10}, {"wpm": 25, "fwpm": 15}],
+      "lessons": [
+        {"name": "week1-letters", "week": 1, "groups": 40},
+        {"name": "week1-words", "list": "week1_words", "repeat": 3},
+        {"name": "my-letters", "letters": "ETAN", "groups": 20, "size": 4},
+        {"name": "qso", "text": "CQ CQ DE N8FIT K"},
+        {"name": "story", "file": "~/story.txt"}
+      ]
+    }
+
+"list" names a word or sentence list in morsecode.py. Random letter
+groups and repeated lists are shuffled with a seed taken from the lesson
+name, so the same spec always produces the same text.
+"""
+import hashlib
+import json
+import os
+import random
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import morsecode
+from audio_calibration import SAMPLE_RATES
+from morsecode import (BAND_PRESETS, FARNSWORTH_LIMITS, FREQUENCY_LIMITS, GAP_MULT_LIMITS, SAMPLE_RATE,
+                       WPM_LIMITS, create_wav, fill_wav, text_samples)
+
+MANIFEST = "manifest.json"
+BUILD_FORMAT = 2            # bump when rendering changes, to rebuild every lesson
+GROUP_SIZE = 5
+LETTER_GROUPS = 40
+
+LESSON_SETTINGS = ("frequency", "gap_mult", "sample_rate", "conditions", "speeds")
+DEFAULT_SPEC = {
+    "frequency": 600,
+    "gap_mult": 2.0,
+    "sample_rate": SAMPLE_RATE,
+    "conditions": "off",
+    "speeds": [{"wpm": 20, "fwpm": 5}, {"wpm": 20, "fwpm": 10}, {"wpm": 25, "fwpm": 18}],
+    "lessons": (
+        [{"name": f"week{week}-letters", "week": week, "groups": LETTER_GROUPS}
+         for week in sorted(morsecode.week_letters)]
+        + [{"name": f"{name.split('_')[0]}-{kind}", "list": name, "repeat": 3}
+           for kind in ("words", "sentences")
+           for name in ("week1_" + kind, "week12_" + kind, "week123_" + kind,
+                        "week1234_" + kind, "week7_" + kind)]),
+}
+
+
+class SpecError(ValueError):
+    pass
+
+
+# === Spec -> lesson entries ===
+def lesson_text(lesson, base_dir="."):
+    """The text a lesson sends; deterministic for a given spec entry."""
+    name = lesson["name"]
+    rng = random.Random(name)
+    if "text" in lesson:
+        return " ".join(lesson["text"].split())
+    if "file" in lesson:
+        path = os.path.join(base_dir, os.path.expanduser(lesson["file"]))
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return " ".join(f.read().split())
+    if "week" in lesson or "letters" in lesson:
+        letters = (lesson["letters"] if "letters" in lesson
+                   else morsecode.week_letters.get(lesson["week"]))
+        if not letters:
+            raise SpecError(f"{name}: unknown week {lesson.get('week')}")
+        letters = letters.replace(" ", "")
+        size = lesson.get("size", GROUP_SIZE)
+        return " ".join("".join(rng.choice(letters) for _ in range(size))
+                        for _ in range(lesson.get("groups", LETTER_GROUPS)))
+    if "list" in lesson:
+        items = getattr(morsecode, lesson["list"], None)
+        if not isinstance(items, list):
+            raise SpecError(f"{name}: morsecode.py has no list named {lesson['list']!r}")
+        text = []
+        for _ in range(lesson.get("repeat", 1)):
+            text.extend(rng.sample(items, len(items)))
+        return " ".join(text)
+    raise SpecError(f"{name}: needs one of text, file, week, letters or list")
+
+
+def check_range(name, field, value, limits):
+    low, high = limits
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+        raise SpecError(f"{name}: {field} must be between {low:g} and {high:g}")
+
+
+def check_settings(name, settings):
+    """Raise SpecError unless the settings are within the limits export accepts."""
+    if settings["conditions"] not in BAND_PRESETS:
+        raise SpecError(f"{name}: conditions must be one of {', '.join(BAND_PRESETS)}")
+    if settings["sample_rate"] not in SAMPLE_RATES:
+        raise SpecError(f"{name}: sample_rate must be one of {', '.join(map(str, SAMPLE_RATES))}")
+    check_range(name, "frequency", settings["frequency"], FREQUENCY_LIMITS)
+    check_range(name, "gap_mult", settings["gap_mult"], GAP_MULT_LIMITS)
+    speeds = settings["speeds"]
+    if not isinstance(speeds, list) or not speeds:
+        raise SpecError(f"{name}: speeds must be a list of {{\"wpm\": ..., \"fwpm\": ...}}")
+    for speed in speeds:
+        if not isinstance(speed, dict) or "wpm" not in speed:
+            raise SpecError(f"{name}: every speed needs a wpm")
+        check_range(name, "wpm", speed["wpm"], WPM_LIMITS)
+        if "fwpm" in speed:
+            check_range(name, "fwpm", speed["fwpm"], FARNSWORTH_LIMITS)
+
+
+def lesson_hash(text, settings, wpm, fwpm):
+    key = dict(format=BUILD_FORMAT, text=text, wpm=wpm, fwpm=fwpm,
+               **{k: settings[k] for k in LESSON_SETTINGS if k != "speeds"})
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def lesson_entries(spec, base_dir="."):
+    """One manifest entry (without results) per lesson and speed."""
+    defaults = {k: spec.get(k, DEFAULT_SPEC[k]) for k in LESSON_SETTINGS}
+    entries = []
+    names = set()
+    for lesson in spec.get("lessons", []):
+        if "name" not in lesson:
+            raise SpecError(f"lesson without a name: {lesson}")
+        settings = {k: lesson.get(k, defaults[k]) for k in LESSON_SETTINGS}
+        check_settings(lesson["name"], settings)
+        text = lesson_text(lesson, base_dir)
+        for speed in settings["speeds"]:
+            wpm, fwpm = speed["wpm"], speed.get("fwpm", speed["wpm"])
+            stem = f"{lesson['name']}-{wpm:g}wpm-{fwpm:g}f"
+            if stem in names:
+                raise SpecError(f"{stem} is listed twice")
+            names.add(stem)
+            entries.append(dict(name=lesson["name"], wav=stem + ".wav", key=stem + ".txt",
+                                hash=lesson_hash(text, settings, wpm, fwpm), text=text,
+                                wpm=wpm, fwpm=fwpm, gap_mult=settings["gap_mult"],
+                                frequency=settings["frequency"],
+                                sample_rate=settings["sample_rate"],
+                                conditions=settings["conditions"]))
+    return entries
+
+
+# === Rendering (runs in the worker processes) ===
+def render_lesson(job):
+    """Write one lesson's WAV and answer key; returns (seconds, characters)."""
+    entry, out_dir = job
+    text = entry["text"] + " "
+    seed = int(entry["hash"][:8], 16)      # same band noise on every rebuild
+    samples = int(np.floor(text_samples(text, entry["wpm"], entry["fwpm"], entry["gap_mult"],
+                                        entry["sample_rate"]) + 0.5))
+    # Write next to the target and rename, so an interrupted build never
+    # leaves a truncated file that looks up to date
+    wav_path = os.path.join(out_dir, entry["wav"])
+    create_wav(wav_path + ".tmp", samples, entry["sample_rate"])
+    characters = fill_wav((text, entry["frequency"], entry["wpm"], entry["fwpm"], entry["gap_mult"],
+                           entry["sample_rate"], 0.0, entry["conditions"], seed, wav_path + ".tmp"))
+    os.replace(wav_path + ".tmp", wav_path)
+    key_path = os.path.join(out_dir, entry["key"])
+    with open(key_path + ".tmp", "w", encoding="utf-8") as key:
+        key.write(textwrap.fill(entry["text"], 60) + "\n")
+    os.replace(key_path + ".tmp", key_path)
+    return samples / entry["sample_rate"], characters
+
+
+# === Build ===
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return {entry["wav"]: entry for entry in json.load(f)["lessons"]}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def up_to_date(entry, old, out_dir):
+    return (old is not None and old["hash"] == entry["hash"]
+            and os.path.exists(os.path.join(out_dir, entry["wav"]))
+            and os.path.exists(os.path.join(out_dir, entry["key"])))
+
+
+def build(spec, out_dir, jobs=None, force=False, base_dir="."):
+    """Render every lesson that changed; returns (built, unchanged, removed)."""
+    os.makedirs(out_dir, exist_ok=True)
+    entries = lesson_entries(spec, base_dir)
+    manifest = load_manifest(out_dir)
+    stale = [e for e in entries if force or not up_to_date(e, manifest.get(e["wav"]), out_dir)]
+    # Longest first, so one long lesson doesn't finish alone at the end
+    stale.sort(key=lambda e: len(e["text"]) / e["fwpm"], reverse=True)
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(render_lesson, [(e, out_dir) for e in stale])
+            for entry, (seconds, characters) in zip(stale, results):
+                entry.update(seconds=round(seconds, 3), characters=characters)
+                print(f"  {entry['wav']}  {seconds:.1f}s")
+    rendered = {e["wav"] for e in stale}
+    for entry in entries:
+        if entry["wav"] not in rendered:
+            old = manifest[entry["wav"]]
+            entry.update(seconds=old.get("seconds"), characters=old.get("characters"))
+
+    # Lessons dropped from the spec lose their files too
+    current = {e["wav"] for e in entries}
+    removed = [old for wav, old in manifest.items() if wav not in current]
+    for old in removed:
+        for name in (old["wav"], old["key"]):
+            path = os.path.join(out_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    with open(os.path.join(out_dir, MANIFEST + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump({"format": BUILD_FORMAT,
+                   "lessons": [{k: v for k, v in e.items() if k != "text"} for e in entries]},
+                  f, indent=2)
+    os.replace(os.path.join(out_dir, MANIFEST + ".tmp"), os.path.join(out_dir, MANIFEST))
+    return len(stale), len(entries) - len(stale), len(removed)
+
+
+def run_build(args) -> int:
+    if args.print_spec:
+        print(json.dumps(DEFAULT_SPEC, indent=2))
+        return 0
+    if args.outdir is None:
+        print("build needs --out (or --print-spec)")
+        return 1
+    spec, base_dir = DEFAULT_SPEC, "."
+    if args.spec:
+        path = morsecode.resolve_path(args.spec)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Spec error: {e}")
+            return 1
+        base_dir = os.path.dirname(path)
+    out_dir = morsecode.resolve_path(args.outdir)
+    started = time.monotonic()
+    try:
+        built, unchanged, removed = build(spec, out_dir, args.jobs, args.force, base_dir)
+    except (OSError, ValueError) as e:
+        print(f"Build stopped: {e}")
+        return 1
+    elapsed = time.monotonic() - started
+    print(f"{out_dir}: {built} built, {unchanged} unchanged, {removed} removed in {elapsed:.1f}s")
+    return 0
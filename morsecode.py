@@ -1,48 +1,76 @@
+import argparse
+import asyncio
+import importlib
 import json
 import os
 import platform
 import random
 import shutil
+import queue
 import subprocess
 import signal
-from typing import Optional
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-from ascii_letters import ascii_letter
+from ascii_letters import ascii_banner, ascii_letter
 
 SETTINGS_FILE = "morse_settings.json"
+SAMPLE_RATE = 44100
+MIXER_BUFFER = 1024         # samples; playback is scheduled ahead, so latency is fine
+KEYER_BUFFER = 128          # samples (~3 ms); sidetone must follow the key
+TONE_CACHE_SIZE = 8
 
-# === 3rd Party Modules ===
-try:
-    import pygame
-except ImportError:
-    print("Error: Pygame is not installed. Run: pip install pygame")
-    exit(1)
+# Ranges allowed in the settings menu and for exports
+WPM_LIMITS = (5, 60)
+FARNSWORTH_LIMITS = (2.0, 40.0)
+GAP_MULT_LIMITS = (0.5, 5.0)
+FREQUENCY_LIMITS = (400, 1000)
 
+# === 3rd Party Modules ===
+# numpy is needed for rendering only; pygame (audio) and pyttsx3 (Windows
+# voice) are imported on first use so importing this module has no side effects.
 try:
     import numpy as np
 except ImportError:
-    print("Error: NumPy is not installed. Run: pip install numpy")
-    exit(1)
+    np = None
 
-try:
-    import pyttsx3
-except ImportError:
-    print("Error: pyttsx3 is not installed. Run: pip install pyttsx3")
-    exit(1)
+pygame = None
+
+
+def require(module_name, display_name):
+    """Import a 3rd party module, or exit with install instructions."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        print(f"Error: {display_name} is not installed. Run: pip install {module_name}")
+        exit(1)
 
 
 # === Settings File Functions ===
+DEFAULT_SETTINGS = {
+    "current_frequency": 500,         # Hz
+    "current_wpm": 25,                # character (dot) speed
+    "farnsworth_wpm": 5.0,            # effective speed via spacing
+    "farnsworth_gap_mult": 2.0,       # extra stretch for inter-char/word
+    "show_morse": False,
+    "show_text": True,
+    "flash_card_mode_enabled": True,
+    "voice_enabled": False,
+    "adaptive_enabled": True,         # drill weak characters more often
+    "band_conditions": "off",         # off, light, moderate or heavy
+    "audio_sample_rate": SAMPLE_RATE, # Hz; 8000-16000 is plenty for one tone
+    "audio_buffer": MIXER_BUFFER,     # samples, for playback
+    "keyer_buffer": KEYER_BUFFER,     # samples, for sending practice (set by calibration)
+    "audio_driver": "",               # SDL audio driver; empty picks one for the platform
+    "audio_latency_ms": 0.0           # measured by calibration; the display waits this long
+}
+
 def load_settings():
-    default_settings = {
-        "current_frequency": 500,         # Hz
-        "current_wpm": 25,                # character (dot) speed
-        "farnsworth_wpm": 5.0,            # effective speed via spacing
-        "farnsworth_gap_mult": 2.0,       # extra stretch for inter-char/word
-        "show_morse": False,
-        "show_text": True,
-        "flash_card_mode_enabled": True,
-        "voice_enabled": False
-    }
     if os.path.exists(SETTINGS_FILE):
         with open(SETTINGS_FILE, 'r') as f:
             settings = json.load(f)
@@ -50,12 +78,14 @@ def load_settings():
         settings = {}
 
     # Ensure all keys exist (backward compatible)
-    for k, v in default_settings.items():
-        settings.setdefault(k, v)
+    missing = [k for k in DEFAULT_SETTINGS if k not in settings]
+    for k in missing:
+        settings[k] = DEFAULT_SETTINGS[k]
 
     # Write back if we added anything
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(settings, f, indent=2)
+    if missing:
+        with open(SETTINGS_FILE, 'w') as f:
+            json.dump(settings, f, indent=2)
     return settings
 
 
@@ -68,16 +98,36 @@ def save_settings():
         "show_morse": show_morse,
         "show_text": show_text,
         "flash_card_mode_enabled": flash_card_mode_enabled,
-        "voice_enabled": voice_enabled
+        "voice_enabled": voice_enabled,
+        "adaptive_enabled": adaptive_enabled,
+        "band_conditions": band_conditions,
+        "audio_sample_rate": audio_sample_rate,
+        "audio_buffer": audio_buffer,
+        "keyer_buffer": keyer_buffer,
+        "audio_driver": audio_driver,
+        "audio_latency_ms": audio_latency_ms
     }
     with open(SETTINGS_FILE, 'w') as f:
         json.dump(settings, f, indent=2)
 
 
 # === Robust Pygame init (CoreAudio on macOS) ===
-def init_audio():
+output_rate = SAMPLE_RATE   # the rate the mixer actually opened with
+
+def open_mixer():
+    """Open the mixer mono 16-bit with the audio settings."""
+    global output_rate
+    pygame.mixer.pre_init(frequency=audio_sample_rate, size=-16, channels=1, buffer=audio_buffer)
+    pygame.init()
+    pygame.mixer.init(frequency=audio_sample_rate, size=-16, channels=1, buffer=audio_buffer)
+    output_rate = pygame.mixer.get_init()[0]
+
+def init_audio(driver=None):
     system = platform.system()
-    if system == "Darwin":
+    driver = driver or audio_driver
+    if driver:
+        os.environ["SDL_AUDIODRIVER"] = driver
+    elif system == "Darwin":
         os.environ["SDL_AUDIODRIVER"] = "coreaudio"
     elif system == "Windows":
         os.environ["SDL_AUDIODRIVER"] = "directsound"
@@ -86,42 +136,67 @@ def init_audio():
     os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 
     try:
-        pygame.mixer.pre_init(frequency=44100, size=-16, channels=1, buffer=1024)
-        pygame.init()
-        pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=1024)
+        open_mixer()
     except pygame.error as e:
         print(f"Audio init error with driver '{os.environ.get('SDL_AUDIODRIVER')}': {e}")
         print("Retrying with SDL default...")
         try:
             os.environ.pop("SDL_AUDIODRIVER", None)
             pygame.mixer.quit(); pygame.quit()
-            pygame.mixer.pre_init(frequency=44100, size=-16, channels=1, buffer=1024)
-            pygame.init()
-            pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=1024)
+            open_mixer()
         except pygame.error as e2:
             print(f"Default driver failed: {e2}")
             print("Falling back to 'dummy' (no-sound) so timing still runs.")
             os.environ["SDL_AUDIODRIVER"] = "dummy"
             pygame.mixer.quit(); pygame.quit()
-            pygame.mixer.pre_init(frequency=44100, size=-16, channels=1, buffer=1024)
-            pygame.init()
-            pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=1024)
+            open_mixer()
+
 
+_audio_ready = False
 
-init_audio()
+def ensure_audio(driver=None):
+    """Import pygame and open the audio device the first time sound is needed."""
+    global pygame, _audio_ready
+    if not _audio_ready:
+        pygame = require("pygame", "Pygame")
+        init_audio(driver)
+        _audio_ready = True
+    return pygame
 
 
 # === Load Settings ===
-settings = load_settings()
-current_frequency        = settings["current_frequency"]
-current_wpm              = settings["current_wpm"]           # character speed
-farnsworth_wpm           = settings["farnsworth_wpm"]        # effective speed
-farnsworth_gap_mult      = settings["farnsworth_gap_mult"]   # extra stretch
-show_morse               = settings["show_morse"]
-show_text                = settings["show_text"]
-flash_card_mode_enabled  = settings["flash_card_mode_enabled"]
-voice_enabled            = settings["voice_enabled"]
-timeout_supported = True
+def apply_settings(settings):
+    global current_frequency, current_wpm, farnsworth_wpm, farnsworth_gap_mult
+    global show_morse, show_text, flash_card_mode_enabled, voice_enabled, adaptive_enabled
+    global band_conditions, audio_sample_rate, audio_buffer, keyer_buffer, audio_driver, audio_latency_ms
+    current_frequency        = settings["current_frequency"]
+    current_wpm              = settings["current_wpm"]           # character speed
+    farnsworth_wpm           = settings["farnsworth_wpm"]        # effective speed
+    farnsworth_gap_mult      = settings["farnsworth_gap_mult"]   # extra stretch
+    show_morse               = settings["show_morse"]
+    show_text                = settings["show_text"]
+    flash_card_mode_enabled  = settings["flash_card_mode_enabled"]
+    voice_enabled            = settings["voice_enabled"]
+    adaptive_enabled         = settings["adaptive_enabled"]
+    band_conditions          = settings["band_conditions"]
+    audio_sample_rate        = settings["audio_sample_rate"]
+    audio_buffer             = settings["audio_buffer"]
+    keyer_buffer             = settings["keyer_buffer"]
+    audio_driver             = settings["audio_driver"]
+    audio_latency_ms         = settings["audio_latency_ms"]
+
+
+_settings_loaded = False
+
+def ensure_settings():
+    """Load the settings file once; until then the defaults are in effect."""
+    global _settings_loaded
+    if not _settings_loaded:
+        apply_settings(load_settings())
+        _settings_loaded = True
+
+
+apply_settings(DEFAULT_SETTINGS)
 
 
 # === Morse Code Map ===
@@ -134,6 +209,7 @@ morse_code = {
     '6': '-....', '7': '--...', '8': '---..', '9': '----.', '0': '-----',
     '.': '.-.-.-', ',': '--..--', '?': '..--..', '/': '-..-.'
 }
+letters_by_code = {code: letter for letter, code in morse_code.items()}
 
 week_letters = {
     1: 'ETIANM',
@@ -163,7 +239,6 @@ week7_words = ["THE", "QUICK", "BROWN", "FOX", "JUMPS", "OVER", "LAZY", "DOG", "
 week7_sentences = ["THE QUICK BROWN FOX JUMPS OVER LAZY DOG.", "PACK MY BOX WITH FIVE DOZEN LIQUOR JUGS."]
 
 all_words = week1_words + week12_words + week123_words + week1234_words
-call_signs = ["WA7SPY/QRP", "KB1FJZ", "N8FIT", "KA2UTL", "W4ZX", "N3BKQ", "WA5PRY/M", "N6OQN", "W8GSH"]
 
 
 # === Timing helpers (Farnsworth) ===
@@ -186,59 +261,124 @@ def space_durations(char_wpm: float, eff_wpm: float, mult: float):
 def timing_now():
     return space_durations(current_wpm, farnsworth_wpm, farnsworth_gap_mult)
 
-# === Utility Functions ===
-def prompt_for_pause(duration_seconds=3.0) -> str:
-    """Wait for specified duration, but allow Enter to pause or 'q' to quit."""
-    global timeout_supported
-    if timeout_supported != True:
-        pygame.time.wait(int(duration_seconds * 1000))
-        return 'continue'
-    try:
-        import select, sys
-        if select.select([sys.stdin], [], [], duration_seconds)[0]:
-            user_input = input().strip().lower()
-            if user_input == 'q':
-                return 'quit'
-            elif user_input == "":
-                print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
-                user_input = input().strip().lower()
-                if user_input == 'q':
-                    return 'quit'
-                else:
-                    print_blue("RESUMED")
-                    return 'continue'
-        else:
-            return 'continue'
-    except:
+# === Keyboard listener (one background thread owns stdin) ===
+_EOF = object()
+
+class KeyboardListener:
+    """Reads stdin lines on a daemon thread and hands them out through a queue.
+
+    A session subscribes for pause/quit lines while it plays, and menus
+    read their answers from the queue, so no line is ever lost between
+    the two.
+    """
+
+    def __init__(self):
+        self.lines = queue.Queue()
+        self.thread = None
+        self.closed = False
+        self.callback = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="keyboard", daemon=True)
+            self.thread.start()
+
+    def _run(self):
         try:
-            import msvcrt, time
-            start = time.time()
-            while time.time() - start < duration_seconds:
-                if msvcrt.kbhit():
-                    key = msvcrt.getch()
-                    if key == b'\r':
-                        print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
-                        user_input = input().strip().lower()
-                        if user_input == 'q':
-                            return 'quit'
-                        else:
-                            print_blue("RESUMED")
-                            return 'continue'
-                    elif key == b'q':
-                        return 'quit'
-                time.sleep(0.05)
-            return 'continue'
-        except:
-            timeout_supported = False
-            print_blue("Press Enter to continue, or type 'q' to quit...")
-            user_input = input().strip().lower()
-            if user_input == 'q':
-                return 'quit'
-            return 'continue'
+            for line in sys.stdin:
+                line = line.rstrip("\r\n")
+                with self.lock:
+                    if self.callback is not None:
+                        self.callback(line)
+                    else:
+                        self.lines.put(line)
+        except (OSError, ValueError):
+            pass
+        self.lines.put(_EOF)
+
+    def subscribe(self, callback):
+        """Deliver lines to callback (on the listener thread) instead of the queue."""
+        self.start()
+        with self.lock:
+            self.callback = callback
+            pending = []
+            while True:
+                try:
+                    pending.append(self.lines.get_nowait())
+                except queue.Empty:
+                    break
+            for line in pending:
+                if line is _EOF:
+                    self.lines.put(_EOF)
+                else:
+                    callback(line)
 
+    def unsubscribe(self):
+        with self.lock:
+            self.callback = None
+
+    def read_line(self, prompt="") -> str:
+        """Blocking replacement for input() that shares the listener's queue."""
+        self.start()
+        print(prompt, end="", flush=True)
+        line = _EOF if self.closed else self.lines.get()
+        if line is _EOF:
+            self.closed = True
+            raise EOFError
+        return line
+
+
+keyboard = KeyboardListener()
+
+def read_line(prompt="") -> str:
+    return keyboard.read_line(prompt)
+
+# === Utility Functions ===
 def print_blue(text):
     print(f"\033[97m{text}\033[0m")
 
+# === Timing statistics ===
+class LatenessRecorder:
+    """How late the timed events of a send were met, for summary()."""
+
+    def __init__(self, history=10000):
+        self.lateness_ns = deque(maxlen=history)
+        self.start()
+
+    def start(self):
+        self.lateness_ns.clear()
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, late_ns):
+        self.lateness_ns.append(late_ns)
+        self.count += 1
+        self.total_ns += late_ns
+        self.max_ns = max(self.max_ns, late_ns)
+
+    def summary(self) -> dict:
+        recent = sorted(self.lateness_ns)
+        p95 = recent[int(len(recent) * 0.95)] if recent else 0
+        return {
+            "deadlines": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+            "p95_ms": p95 / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+lateness = LatenessRecorder()
+
+def print_timing_summary():
+    st = lateness.summary()
+    if not st["deadlines"]:
+        print_blue("No send has been timed yet.")
+        return
+    print_blue(f"Last send: {st['deadlines']} deadlines | late by mean {st['mean_ms']:.3f} ms, "
+               f"p95 {st['p95_ms']:.3f} ms, max {st['max_ms']:.3f} ms")
+
 # === Tone generation (mono int16) ===
 def generate_tone(frequency, duration, sample_rate=44100):
     t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
@@ -251,42 +391,195 @@ def generate_tone(frequency, duration, sample_rate=44100):
     wave_int16 = np.int16(wave * 32767)
     return wave_int16  # 1-D mono
 
-# === Core playback (fixed intra-character spacing + Farnsworth) ===
-def play_morse(letter, include_farnsworth=True) -> str:
-    """Play the elements of one character with proper 1-dot gaps BETWEEN elements only."""
-    if letter == ' ':
-        return 'continue'
-
-    code = morse_code.get(letter, '')
-    dot_s, intra_gap, _, _ = timing_now()
-
-    for i, symbol in enumerate(code):
-        dur = dot_s * (3.0 if symbol == '-' else 1.0)
-        tone = generate_tone(current_frequency, dur)
-        sound = pygame.sndarray.make_sound(tone)
-        sound.play()
-        result = prompt_for_pause(dur)
-        if result == 'quit':
-            return 'quit'
-
-        # 1 dot gap only if NOT the last element
-        if i < len(code) - 1:
-            result = prompt_for_pause(intra_gap)
-            if result == 'quit':
-                return 'quit'
-
-    return 'continue'
+# === Tone cache (pre-built dot/dash Sounds, LRU bounded) ===
+_tone_cache = OrderedDict()
+
+def element_sounds(frequency, wpm, sample_rate=SAMPLE_RATE):
+    """Return cached (dot, dash) Sounds for this frequency/WPM/sample rate."""
+    key = (frequency, wpm, sample_rate)
+    sounds = _tone_cache.get(key)
+    if sounds is not None:
+        _tone_cache.move_to_end(key)
+        return sounds
+    ensure_audio()
+    dot_s = dot_duration_seconds(wpm)
+    sounds = (
+        pygame.sndarray.make_sound(generate_tone(frequency, dot_s, sample_rate)),
+        pygame.sndarray.make_sound(generate_tone(frequency, dot_s * 3.0, sample_rate)),
+    )
+    _tone_cache[key] = sounds
+    while len(_tone_cache) > TONE_CACHE_SIZE:
+        _tone_cache.popitem(last=False)
+    return sounds
+
+def clear_tone_cache():
+    _tone_cache.clear()
+
+def reopen_mixer(buffer=None):
+    """Reopen the mixer (by default with the audio settings); Sounds made before are dropped."""
+    global output_rate
+    ensure_audio()
+    pygame.mixer.quit()
+    pygame.mixer.init(frequency=audio_sample_rate, size=-16, channels=1, buffer=buffer or audio_buffer)
+    output_rate = pygame.mixer.get_init()[0]
+    clear_tone_cache()
+    _voice_sounds.clear()
+
+def restart_audio():
+    """Close the audio device and open it again with the current audio settings."""
+    global _audio_ready
+    if _audio_ready:
+        pygame.mixer.quit()
+        os.environ.pop("SDL_AUDIODRIVER", None)
+        _audio_ready = False
+    clear_tone_cache()
+    _voice_sounds.clear()
+    ensure_audio()
+
+def calibrate_audio():
+    """Measure latency and underruns per buffer size; keep the smallest safe buffer."""
+    global audio_buffer, keyer_buffer, audio_latency_ms
+    from audio_calibration import calibrate, smallest_safe
+    ensure_audio()
+    print_blue(f"Measuring output at {audio_sample_rate} Hz "
+               f"(driver: {os.environ.get('SDL_AUDIODRIVER', 'default')})...")
+    results = calibrate(pygame, audio_sample_rate)
+    best = smallest_safe(results)
+    if best is None:
+        print_blue("No buffer size played without underruns; settings unchanged.")
+        reopen_mixer()
+        return None
+    keyer_buffer = best["buffer"]
+    # Playback keeps its buffer unless that one underran
+    playback = next((r for r in results if r["buffer"] == audio_buffer), None)
+    if playback is None or not playback["safe"]:
+        playback = next((r for r in results if r["safe"] and r["buffer"] >= audio_buffer), best)
+        audio_buffer = playback["buffer"]
+    audio_latency_ms = round(playback["latency"] * 1000, 1)
+    save_settings()
+    reopen_mixer()
+    print_blue(f"Smallest safe buffer: {keyer_buffer} samples ({best['latency'] * 1000:.1f} ms), "
+               f"used for sending practice.")
+    print_blue(f"Playback buffer: {audio_buffer} samples, {audio_latency_ms:.1f} ms latency "
+               f"(the display is delayed to match).")
+    return best
 
 # === Voice ===
+VOICE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "morsecode", "voice")
+
+_voice_engine = None
+_voice_sounds = {}
+_voice_cache_checked = False
+
+def voice_engine():
+    """(engine, voice) used for speech on this platform, or None if there is none."""
+    global _voice_engine
+    if _voice_engine is None:
+        system = platform.system()
+        if system == "Darwin":
+            _voice_engine = ("say", "default")
+        elif system == "Linux" and shutil.which("espeak"):
+            _voice_engine = ("espeak", "default")
+        elif system == "Windows":
+            try:
+                import pyttsx3
+                engine = pyttsx3.init()
+                _voice_engine = ("pyttsx3", str(engine.getProperty("voice")))
+                engine.stop()
+            except Exception:
+                _voice_engine = ()
+        else:
+            _voice_engine = ()
+    return _voice_engine or None
+
+def voice_cache_path(text, engine):
+    name, voice = engine
+    folder = "".join(c if c.isalnum() else "_" for c in f"{name}-{voice}")
+    # Hex keeps characters such as '/' and '?' out of the file name
+    return os.path.join(VOICE_CACHE_DIR, folder, text.encode("utf-8").hex() + ".wav")
+
+def synthesize_to_file(text, path, engine) -> bool:
+    """Render speech for text into a WAV file; True on success."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp.wav"
+    try:
+        if engine[0] == "say":
+            subprocess.run(["say", "-o", tmp_path, "--data-format=LEI16@22050", text.lower()],
+                           check=True, capture_output=True)
+        elif engine[0] == "espeak":
+            subprocess.run(["espeak", "-w", tmp_path, text], check=True, capture_output=True)
+        elif engine[0] == "pyttsx3":
+            import pyttsx3
+            tts = pyttsx3.init()
+            tts.save_to_file(text, tmp_path)
+            tts.runAndWait()
+            tts.stop()
+        os.replace(tmp_path, path)
+        return True
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+def voice_cache_texts():
+    return list(morse_code) + sorted(set(all_words + week7_words))
+
+def build_voice_cache(texts=None) -> int:
+    """Synthesize any missing cache entries; returns how many were built."""
+    engine = voice_engine()
+    if engine is None:
+        return 0
+    built = 0
+    for text in (voice_cache_texts() if texts is None else texts):
+        path = voice_cache_path(text, engine)
+        if not os.path.exists(path) and synthesize_to_file(text, path, engine):
+            built += 1
+    return built
+
+def ensure_voice_cache():
+    """Fill the voice cache once per run, before the first spoken reveal."""
+    global _voice_cache_checked
+    if not _voice_cache_checked:
+        engine = voice_engine()
+        if engine is not None and any(not os.path.exists(voice_cache_path(t, engine))
+                                      for t in voice_cache_texts()):
+            print_blue("Preparing voice cache (first run only)...")
+            build_voice_cache()
+        _voice_cache_checked = True
+
+def cached_voice_sound(text):
+    """Sound for text from the voice cache, or None if it isn't cached."""
+    engine = voice_engine()
+    if engine is None:
+        return None
+    key = (engine, text)
+    sound = _voice_sounds.get(key)
+    if sound is None:
+        path = voice_cache_path(text, engine)
+        if not os.path.exists(path):
+            return None
+        ensure_audio()
+        try:
+            sound = pygame.mixer.Sound(path)
+        except pygame.error:
+            return None
+        _voice_sounds[key] = sound
+    return sound
+
 def speak_text(text) -> None:
+    sound = cached_voice_sound(text)
+    if sound is not None:
+        sound.play()
+        return
     system = platform.system()
     if system == "Darwin":  # macOS
         os.system(f"say '{text.lower()}'")
     elif system == "Linux":
         if shutil.which("espeak"):
             subprocess.run(["espeak", text])
-    elif system == "Windows" and pyttsx3 is not None:
+    elif system == "Windows":
         try:
+            import pyttsx3
             engine = pyttsx3.init()
             engine.say(text)
             engine.runAndWait()
@@ -294,16 +587,66 @@ def speak_text(text) -> None:
         except Exception:
             pass
 
-# === Play Letter ===
-def play_letter(letter, include_farnsworth=True) -> str:
-    dot_s, _, inter_char_gap, inter_word_gap = timing_now()
+# === Non-blocking speech (one TTS worker thread) ===
+TTS_WORKERS = 1             # more would speak reveals over each other or out of order
+TTS_BACKLOG = 4
+
+class SpeechPool:
+    """A worker thread that speaks queued texts in order without blocking playback.
+
+    The backlog is bounded; when it is full the oldest waiting text is
+    dropped, so speech never falls further and further behind the Morse.
+    """
+
+    def __init__(self, workers=TTS_WORKERS, backlog=TTS_BACKLOG):
+        self.pending = deque(maxlen=backlog)
+        self.ready = threading.Condition()
+        self.workers = workers
+        self.threads = []
+        self.dropped = 0
+
+    def speak(self, text):
+        with self.ready:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(text)
+            self.ready.notify()
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._run, name="tts", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def _run(self):
+        while True:
+            with self.ready:
+                while not self.pending:
+                    self.ready.wait()
+                text = self.pending.popleft()
+            speak_text(text)
+
+
+speech_pool = SpeechPool()
+
+def speak_text_async(text) -> None:
+    """Start speaking text and return at once."""
+    sound = cached_voice_sound(text)
+    if sound is not None:
+        sound.play()
+    else:
+        speech_pool.speak(text)
 
-    if letter == ' ':
-        return prompt_for_pause(inter_word_gap)
+# === Letter display ===
+def show_letter(letter, word="") -> None:
+    """Show the character being sent; flash cards show the word sent so far."""
     show_msg = ""
     if flash_card_mode_enabled:
         show_msg = "\n\n"
-        show_msg += ascii_letter(letter)
+        banner = ascii_banner(word) if len(word) > 1 else ""
+        # Too wide for the terminal: fall back to the single letter
+        if banner and max(map(len, banner.split("\n"))) <= shutil.get_terminal_size().columns:
+            show_msg += banner
+        else:
+            show_msg += ascii_letter(letter)
     elif show_morse or show_text:
         show_msg += "Sending:"
         if show_text:
@@ -313,51 +656,422 @@ def play_letter(letter, include_farnsworth=True) -> str:
         
     print_blue(show_msg)
 
-    # Play elements
-    result = play_morse(letter, include_farnsworth)
-    if result == 'quit':
-        return 'quit'
+# === Compiled timeline (key state, duration in samples, source character) ===
+# A text is compiled once into a numpy structured array with one row per
+# tone or gap. Rendering, export, flash-card/voice events and statistics
+# all read that array instead of walking the text through morse_code again.
+KEY_UP, KEY_DOWN, KEY_VOICE = 0, 1, 2      # KEY_VOICE: silent, then the character is spoken
+TIMELINE_DTYPE = [('key', 'u1'), ('samples', 'u4'), ('char', 'u4')]
+STREAM_BLOCK_SECONDS = 3.0
+
+def element_samples(char_wpm, eff_wpm, mult, sample_rate=SAMPLE_RATE):
+    """Exact (fractional) sample lengths of a dot, a dash and the gaps."""
+    dot_s, intra_gap, inter_char_gap, inter_word_gap = space_durations(char_wpm, eff_wpm, mult)
+    return {
+        '.': dot_s * sample_rate,
+        '-': dot_s * 3.0 * sample_rate,
+        'intra': intra_gap * sample_rate,
+        'char': inter_char_gap * sample_rate,
+        'word': inter_word_gap * sample_rate,
+        'voice': dot_s * 6 * sample_rate,   # pause before the spoken reveal
+    }
 
-    # Optional voice reveal
-    if voice_enabled:
-        result = prompt_for_pause(dot_s * 6)
-        if result == 'quit':
-            return 'quit'
-        speak_text(letter)
+@lru_cache(maxsize=TONE_CACHE_SIZE)
+def timeline_templates(char_wpm, eff_wpm, mult, sample_rate=SAMPLE_RATE, voice=False):
+    """Segments of every character, indexed by code point.
+
+    Returns (table, first, count, span): table holds the (key, exact
+    length) rows of all characters back to back, first/count (129
+    entries; code points above 127 use the last, empty one) locate each
+    character's rows and span is each character's total exact length.
+    """
+    n = element_samples(char_wpm, eff_wpm, mult, sample_rate)
+    first = np.zeros(129, dtype=np.int64)
+    count = np.zeros(129, dtype=np.int64)
+    span = np.zeros(129, dtype=np.float64)
+    rows = []
+    templates = {' ': [(KEY_UP, n['word'])]}
+    for char, code in morse_code.items():
+        segments = []
+        for i, symbol in enumerate(code):
+            segments.append((KEY_DOWN, n[symbol]))
+            if i < len(code) - 1:
+                segments.append((KEY_UP, n['intra']))
+        if voice:
+            segments.append((KEY_VOICE, n['voice']))
+        segments.append((KEY_UP, n['char']))
+        templates[char] = segments
+    for char, segments in templates.items():
+        first[ord(char)] = len(rows)
+        count[ord(char)] = len(segments)
+        span[ord(char)] = sum(length for _, length in segments)
+        rows.extend(segments)
+    table = np.array(rows, dtype=[('key', 'u1'), ('length', 'f8')])
+    return table, first, count, span
+
+def code_points(text):
+    """Code points of text.upper(), with everything above 127 folded to 128."""
+    points = np.frombuffer(text.upper().encode('utf-32-le'), dtype=np.uint32)
+    return np.minimum(points, 128)
+
+def text_samples(text, char_wpm, eff_wpm, mult, sample_rate=SAMPLE_RATE, voice=False) -> float:
+    """Exact (fractional) length of text in samples, without compiling it."""
+    span = timeline_templates(char_wpm, eff_wpm, mult, sample_rate, voice)[3]
+    return float(span[code_points(text)].sum())
+
+def compile_timeline(text, char_wpm, eff_wpm, mult, sample_rate=SAMPLE_RATE, voice=False, start=0.0):
+    """Compile text into a TIMELINE_DTYPE array; 'char' indexes text.upper().
+
+    Characters without Morse code produce no rows. The expansion is done
+    with vectorized lookups, so large texts compile without a Python loop.
+
+    Segment lengths are whole samples, but every boundary is placed at the
+    nearest sample to its exact position (Bresenham-style error diffusion),
+    so rounding never accumulates. start is the exact position the text
+    starts at when it continues an earlier one (see text_samples); the
+    pieces of a long send then add up to within one sample of nominal.
+    """
+    table, first, count, _ = timeline_templates(char_wpm, eff_wpm, mult, sample_rate, voice)
+    points = code_points(text)
+    rows_per_char = count[points]
+    total = int(rows_per_char.sum())
+    # Row k of the output is row (k - start of its char) of that char's template
+    char_index = np.repeat(np.arange(len(points), dtype=np.uint32), rows_per_char)
+    out_start = np.cumsum(rows_per_char) - rows_per_char
+    source = np.repeat(first[points] - out_start, rows_per_char) + np.arange(total)
+    bounds = np.empty(total + 1, dtype=np.float64)
+    bounds[0] = start
+    np.cumsum(table['length'][source], out=bounds[1:])
+    bounds[1:] += start
+    timeline = np.empty(total, dtype=TIMELINE_DTYPE)
+    timeline['key'] = table['key'][source]
+    timeline['samples'] = np.diff(np.floor(bounds + 0.5).astype(np.int64))
+    timeline['char'] = char_index
+    return timeline
+
+def tone_samples(frequency, count, sample_rate=SAMPLE_RATE):
+    """count samples of tone with 5 ms ramps (as generate_tone)."""
+    return generate_tone(frequency, (count + 0.5) / sample_rate, sample_rate)[:count]
+
+def render_timeline(timeline, frequency, sample_rate=SAMPLE_RATE, out=None):
+    """Render a compiled timeline to one int16 buffer (or into out, e.g. a memmap)."""
+    lengths = timeline['samples'].astype(np.int64)
+    starts = np.cumsum(lengths) - lengths
+    if out is None:
+        buffer = np.zeros(int(lengths.sum()), dtype=np.int16)
+    else:
+        buffer = out
+        buffer[:] = 0
+    down = timeline['key'] == KEY_DOWN
+    for count in np.unique(lengths[down]).tolist():
+        tone = tone_samples(frequency, count, sample_rate)
+        for start in starts[down & (lengths == count)].tolist():
+            buffer[start:start + count] = tone
+    return buffer
+
+def timeline_chunks(timeline, block_samples):
+    """(rows, sample offset) pieces of a timeline of about block_samples each.
+
+    Pieces only start at a key-down row, after a key-up row of at least a
+    dot, so each renders exactly as it would inside the whole timeline.
+    """
+    lengths = timeline['samples'].astype(np.int64)
+    begins = np.cumsum(lengths) - lengths
+    down = np.flatnonzero(timeline['key'] == KEY_DOWN)
+    targets = np.arange(block_samples, int(lengths.sum()), block_samples)
+    picks = np.searchsorted(begins[down], targets)
+    cuts = np.unique(down[picks[picks < len(down)]])
+    bounds = [0] + cuts[cuts > 0].tolist() + [len(timeline)]
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        yield timeline[first:last], int(begins[first]) if first < len(timeline) else 0
+
+def sent_word(text, i):
+    """The word in text up to and including position i, keeping only characters that are sent."""
+    return ''.join(char for char in text[text.rfind(' ', 0, i) + 1:i + 1] if char in morse_code)
+
+def timeline_events(timeline, text):
+    """(sample_offset, action, text) entries for display and voice.
+
+    'show' is at the first tone of each character, with the word up to and
+    including it; 'speak' is at the end of the character's voice pause.
+    """
+    text = text.upper()
+    lengths = timeline['samples'].astype(np.int64)
+    ends = np.cumsum(lengths)
+    chars = timeline['char']
+    down = np.flatnonzero(timeline['key'] == KEY_DOWN)
+    shown = down[np.r_[True, chars[down][1:] != chars[down][:-1]]] if len(down) else down
+    events = [(offset, 'show', sent_word(text, i))
+              for offset, i in zip((ends[shown] - lengths[shown]).tolist(), chars[shown].tolist())]
+    voiced = np.flatnonzero(timeline['key'] == KEY_VOICE)
+    if len(voiced):
+        events += [(offset, 'speak', text[i])
+                   for offset, i in zip(ends[voiced].tolist(), chars[voiced].tolist())]
+        events.sort(key=lambda event: event[0])
+    return events
+
+def timeline_stats(timeline, sample_rate=SAMPLE_RATE):
+    """Length, keyed time, characters sent and effective WPM of a timeline."""
+    lengths = timeline['samples'].astype(np.int64)
+    seconds = lengths.sum() / sample_rate
+    characters = len(np.unique(timeline['char'][timeline['key'] == KEY_DOWN]))
+    return {
+        'seconds': seconds,
+        'tone_seconds': lengths[timeline['key'] == KEY_DOWN].sum() / sample_rate,
+        'characters': characters,
+        'wpm': characters / 5.0 / (seconds / 60.0) if seconds else 0.0,  # 5 characters per word
+    }
 
-    # Inter-character spacing ONCE here
-    if include_farnsworth == False:
-        return
-    return prompt_for_pause(inter_char_gap)
+def render_text(text, frequency, char_wpm, eff_wpm, mult, sample_rate=SAMPLE_RATE, voice=False):
+    """Render text into one int16 buffer.
+
+    Returns (buffer, events); see timeline_events for the event entries.
+    """
+    timeline = compile_timeline(text, char_wpm, eff_wpm, mult, sample_rate, voice)
+    return render_timeline(timeline, frequency, sample_rate), timeline_events(timeline, text)
+
+def render_blocks(texts, frequency, char_wpm, eff_wpm, mult, sample_rate=SAMPLE_RATE,
+                  voice=False, block_seconds=STREAM_BLOCK_SECONDS, conditions=None):
+    """Yield (buffer, events, tone_end) blocks of roughly block_seconds from an iterable of texts.
+
+    tone_end is the sample offset in the block where its last tone ends
+    (0 without tones). conditions is an optional
+    band_conditions.BandConditions to render through.
+    """
+    block_samples = int(block_seconds * sample_rate)
+    pieces = []
+    events = []
+    offset = 0
+    tone_end = 0
+    position = 0.0      # exact position of the next text, so rounding never drifts
+    for text in texts:
+        timeline = compile_timeline(text, char_wpm, eff_wpm, mult, sample_rate, voice, position)
+        if conditions is None:
+            buffer = render_timeline(timeline, frequency, sample_rate)
+        else:
+            buffer = conditions.render(timeline, frequency, sample_rate, int(np.floor(position + 0.5)))
+        position += text_samples(text, char_wpm, eff_wpm, mult, sample_rate, voice)
+        text_events = timeline_events(timeline, text)
+        down = np.flatnonzero(timeline['key'] == KEY_DOWN)
+        if len(down):
+            tone_end = offset + int(timeline['samples'][:down[-1] + 1].sum(dtype=np.int64))
+        if len(buffer):
+            pieces.append(buffer)
+            events += [(offset + at, action, char) for at, action, char in text_events]
+            offset += len(buffer)
+        if offset >= block_samples:
+            yield np.concatenate(pieces), events, tone_end
+            pieces, events, offset, tone_end = [], [], 0, 0
+    if pieces:
+        yield np.concatenate(pieces), events, tone_end
+
+BAND_PRESETS = ("off", "light", "moderate", "heavy")
+
+def band_simulator(name, seed=None):
+    """A band_conditions.BandConditions for a preset name, or None for "off"."""
+    if name == "off":
+        return None
+    from band_conditions import conditions
+    return conditions(name, seed)
+
+# === Session engine (asyncio: audio, display, voice and keyboard tasks) ===
+VOICE_STALE_SECONDS = 1.0
+
+class SessionClock:
+    """Shared session timeline in seconds; it stands still while paused."""
+
+    def __init__(self):
+        self.origin = time.monotonic()
+        self.paused_at = None
+        self.running = asyncio.Event()
+        self.running.set()
+
+    def restart(self):
+        self.origin = time.monotonic()
+
+    def now(self) -> float:
+        t = self.paused_at if self.paused_at is not None else time.monotonic()
+        return t - self.origin
+
+    def pause(self):
+        self.paused_at = time.monotonic()
+        self.running.clear()
+
+    def resume(self):
+        self.origin += time.monotonic() - self.paused_at
+        self.paused_at = None
+        self.running.set()
+
+    async def sleep_until(self, t) -> float:
+        """Sleep until timeline time t; return how late we woke (seconds)."""
+        while True:
+            await self.running.wait()
+            remaining = t - self.now()
+            if remaining <= 0:
+                return -remaining
+            await asyncio.sleep(remaining)
+
+
+class SessionEngine:
+    """Runs one send as coordinated asyncio tasks on a shared timeline.
+
+    The audio task renders texts block by block ahead of playback and
+    queues them on one mixer channel, the display and voice tasks act on
+    the character events of those blocks at their timeline positions
+    (terminal output and speech run in worker threads so they can't
+    delay anything else), and the keyboard task handles pause and quit.
+    """
+
+    def __init__(self, texts, settle=True):
+        self.texts = texts
+        self.settle = settle    # False: stop at the last tone, skipping the trailing gap
+
+    async def run(self) -> str:
+        loop = asyncio.get_running_loop()
+        self.clock = SessionClock()
+        self.display_events = asyncio.Queue()
+        self.voice_events = asyncio.Queue()
+        self.lines = asyncio.Queue()
+        self.channel = None
+        self.result = 'continue'
+        lateness.start()
+
+        keyboard.subscribe(lambda line: loop.call_soon_threadsafe(self.lines.put_nowait, line))
+        parts = [asyncio.ensure_future(part)
+                 for part in (self.audio_task(), self.display_task(), self.voice_task())]
+        send = asyncio.gather(*parts)
+        keys = asyncio.ensure_future(self.keyboard_task())
+        failure = None
+        try:
+            await asyncio.wait({send, keys}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            keyboard.unsubscribe()
+            finished = send.done() and not send.cancelled()
+            if finished:
+                failure = send.exception()
+            # A failed gather leaves its other parts running; cancel them one by one
+            for task in parts + [keys]:
+                task.cancel()
+            await asyncio.gather(*parts, keys, return_exceptions=True)
+            if (not finished or failure is not None) and self.channel is not None:
+                self.channel.stop()     # don't leave queued audio playing over the menu
+        if failure is not None:
+            raise failure
+        return self.result
+
+    def post(self, start, events):
+        for offset, action, text in events:
+            target = self.display_events if action == 'show' else self.voice_events
+            target.put_nowait((start + offset / output_rate + audio_latency_ms / 1000.0, text))
+
+    async def audio_task(self):
+        blocks = render_blocks(self.texts, current_frequency, current_wpm, farnsworth_wpm,
+                               farnsworth_gap_mult, output_rate, voice=voice_enabled,
+                               conditions=band_simulator(band_conditions))
+        block = await asyncio.to_thread(next, blocks, None)
+        end = last_tone = 0.0
+        if block is not None:
+            buffer, events, tone_end = block
+            self.channel = pygame.sndarray.make_sound(buffer).play()
+            self.clock.restart()
+            self.post(0.0, events)
+            end = len(buffer) / output_rate
+            last_tone = tone_end / output_rate
+            # Render and queue the next block while the current one plays
+            while True:
+                upcoming = await asyncio.to_thread(next, blocks, None)
+                if upcoming is None:
+                    break
+                buffer, events, tone_end = upcoming
+                self.channel.queue(pygame.sndarray.make_sound(buffer))
+                self.post(end, events)
+                await self.clock.sleep_until(end)
+                if tone_end:
+                    last_tone = end + tone_end / output_rate
+                end += len(buffer) / output_rate
+            if not self.settle:
+                # From the timeline, not the samples: band noise is never silent
+                end = last_tone
+        await self.clock.sleep_until(end)
+        self.display_events.put_nowait(None)
+        self.voice_events.put_nowait(None)
+
+    async def display_task(self):
+        while (event := await self.display_events.get()) is not None:
+            t, word = event
+            late = await self.clock.sleep_until(t)
+            lateness.record(int(late * 1e9))
+            await asyncio.to_thread(show_letter, word[-1], word)
+
+    async def voice_task(self):
+        while (event := await self.voice_events.get()) is not None:
+            t, char = event
+            await self.clock.sleep_until(t)
+            if self.clock.now() - t > VOICE_STALE_SECONDS:
+                continue    # speech fell behind; skip rather than drift further
+            speak_text_async(char)
+
+    async def keyboard_task(self):
+        while True:
+            user_input = (await self.lines.get()).strip().lower()
+            if user_input == 'q':
+                self.result = 'quit'
+                return
+            if self.clock.paused_at is not None:
+                if self.channel is not None:
+                    self.channel.unpause()
+                self.clock.resume()
+                print_blue("RESUMED")
+            elif user_input == "":
+                if self.channel is not None:
+                    self.channel.pause()
+                self.clock.pause()
+                print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
+
+
+def run_session(texts, settle=True) -> str:
+    """Send an iterable of texts through the session engine."""
+    ensure_audio()
+    if voice_enabled:
+        ensure_voice_cache()
+    return asyncio.run(SessionEngine(texts, settle).run())
 
 # === High-level send ===
 def play_text(text) -> str:
-    for char in text.upper():
-        if char in morse_code or char == ' ':
-            result = play_letter(char)
-            if result == 'quit':
-                return 'quit'
-    return 'continue'
+    return run_session([text])
 
-def practice_week_letters_continuously(week_num) -> str:
-    letters = week_letters[week_num]
-    i = 0
+def random_letter_groups(letters, size=5, pick=None):
+    """Endless groups of random letters, each followed by a word space."""
+    if pick is None:
+        pick = lambda: random.choice(letters)
     while True:
-        letter = random.choice(letters)
-        if letter == ' ':
-            continue
+        yield ''.join(pick() for _ in range(size)) + ' '
 
-        # After 5 letters, play a space.
-        if i >= 5:
-            result = play_letter(' ')
-            if result == 'quit':
-                break
-            i = 0
-
-        result = play_letter(letter)
-        if result == 'quit':
-            break
-        i += 1
+def practice_week_letters_continuously(week_num) -> str:
+    letters = week_letters[week_num]
+    selector = letter_selector(letters)
+    return run_session(random_letter_groups(letters, pick=selector.choice if selector else None))
+
+_corpus_index = None
+
+def corpus_index():
+    """Word corpus indexed by letter set, loaded on first use."""
+    global _corpus_index
+    if _corpus_index is None:
+        from word_index import WordIndex
+        # The lesson word lists keep the early weeks from drawing one word over and over
+        _corpus_index = WordIndex.load(extra=all_words + week7_words)
+    return _corpus_index
+
+def letters_through_week(week_num) -> str:
+    return ''.join(week_letters[i] for i in range(1, week_num + 1))
+
+def play_corpus_words(week_num, count=3) -> str:
+    words = corpus_index().random_words(letters_through_week(week_num), count)
+    if not words:
+        print_blue("No dictionary words use only those letters yet.")
+        return 'continue'
+    return play_text(" ".join(words))
 
 def play_random_text(text_list, count=1) -> str:
     if count > 1:
@@ -367,6 +1081,33 @@ def play_random_text(text_list, count=1) -> str:
         text = random.choice(text_list)
     play_text(text)
 
+_stats_store = None
+
+def stats_store():
+    """The practice statistics database, opened on first use."""
+    global _stats_store
+    if _stats_store is None:
+        from practice_stats import StatsStore
+        _stats_store = StatsStore()
+    return _stats_store
+
+def show_char_stats(last_n=50):
+    stats = stats_store().char_accuracy(last_n)
+    if not stats:
+        print_blue("No quiz answers recorded yet.")
+        return
+    print_blue(f"\nAccuracy over each character's last {last_n} answers (weakest first)")
+    for char, (attempts, accuracy, mean_ms) in sorted(stats.items(), key=lambda kv: kv[1][1]):
+        print_blue(f"  {char}  {accuracy * 100:5.1f}%  of {attempts:3d}  |  {mean_ms / 1000:5.2f}s to answer")
+
+def letter_selector(letters):
+    """Adaptive selector seeded from quiz history, or None for uniform picks."""
+    if not adaptive_enabled:
+        return None
+    from adaptive import AdaptiveSelector
+    letters = list(dict.fromkeys(letters))
+    return AdaptiveSelector.from_stats(letters, stats_store().char_accuracy(chars=letters))
+
 def quiz_mode(week_num) -> str:
     global flash_card_mode_enabled, voice_enabled, show_text
     print("Disabling Flash Card Mode")
@@ -375,25 +1116,57 @@ def quiz_mode(week_num) -> str:
     voice_enabled = False
     show_text = False
     letters = week_letters[week_num]
+    selector = letter_selector(letters)
     while True:
-        letter = random.choice(letters)
+        letter = selector.choice() if selector else random.choice(letters)
         if letter == ' ':
             continue
 
-        result = play_letter(letter, False)
+        result = run_session([letter], settle=False)
         if result == 'quit':
             break
         
         # Get user guess
-        guess = input("Guess (type 'quit' to quit): ").upper()
+        asked = time.monotonic()
+        guess = read_line("Guess (type 'quit' to quit): ").upper()
+        if guess == "QUIT":
+            break
+        response_ms = (time.monotonic() - asked) * 1000.0
+        stats_store().record(letter, guess, guess == letter.upper(), response_ms,
+                             current_wpm, farnsworth_wpm, farnsworth_gap_mult)
+        if selector:
+            selector.update(letter, guess == letter.upper(), response_ms)
         if guess == letter.upper():
             print("CORRECT!")
-        elif guess == "QUIT":
-            break
         else:
             print("Not quite! That was a", letter)
     show_text = True
 
+def call_sign_quiz() -> None:
+    """Copy generated call signs; none repeats within the session."""
+    from callsigns import session_pool
+    global flash_card_mode_enabled, voice_enabled, show_text
+    flash_card_mode_enabled = False
+    voice_enabled = False
+    show_text = False
+    asked = correct = 0
+    while True:
+        call = session_pool().draw()
+        if run_session([call], settle=False) == 'quit':
+            break
+        guess = read_line("Call sign (type 'quit' to quit): ").strip().upper()
+        if guess == "QUIT":
+            break
+        asked += 1
+        if guess == call:
+            correct += 1
+            print("CORRECT!")
+        else:
+            print("Not quite! That was", call)
+    if asked:
+        print_blue(f"You copied {correct} of {asked} call signs.")
+    show_text = True
+
 # === File utilities (NEW) ===
 def resolve_path(p: str) -> str:
     """Expand ~ and env vars; return absolute path."""
@@ -402,21 +1175,207 @@ def resolve_path(p: str) -> str:
         p = os.path.abspath(p)
     return p
 
-def load_text_file(p: str) -> Optional[str]:
+def open_text_file(p: str):
     try:
-        with open(p, "r", encoding="utf-8", errors="replace") as f:
-            return f.read()
+        return open(p, "r", encoding="utf-8", errors="replace")
     except Exception as e:
         print_blue(f"File error: {e}")
         return None
 
+def iter_words(f, chunk_size=64 * 1024):
+    """Yield whitespace-separated words from a file, reading fixed-size chunks."""
+    tail = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        words = (tail + chunk).split()
+        # A word touching the chunk end may continue in the next chunk
+        if words and not chunk[-1].isspace():
+            tail = words.pop()
+        else:
+            tail = ""
+        yield from words
+    if tail:
+        yield tail
+
+def send_text_file(f) -> str:
+    """Send a file word by word without holding its contents in memory."""
+    return run_session(word + ' ' for word in iter_words(f))
+
+# === Headless WAV export ===
+EXPORT_SEGMENT_WORDS = 200
+EXPORT_BLOCK_SECONDS = 10.0     # samples are mapped and written this much at a time
+WAV_HEADER_BYTES = 44
+WAV_MAX_SAMPLES = (0xFFFFFFFF - 36) // 2    # RIFF sizes are 32-bit
+
+def iter_segments(words, words_per_segment=EXPORT_SEGMENT_WORDS):
+    """Group words into segment strings, each ending with its word gap."""
+    segment = []
+    for word in words:
+        segment.append(word)
+        if len(segment) >= words_per_segment:
+            yield ' '.join(segment) + ' '
+            segment = []
+    if segment:
+        yield ' '.join(segment) + ' '
+
+def wav_header(samples, sample_rate):
+    """The 44-byte header of a mono 16-bit PCM WAV holding `samples` samples."""
+    data = 2 * samples
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data, b'WAVE', b'fmt ', 16, 1, 1,
+                       sample_rate, 2 * sample_rate, 2, 16, b'data', data)
+
+def check_wav_length(samples, sample_rate):
+    if samples > WAV_MAX_SAMPLES:
+        raise ValueError(f"too long for a WAV file (at most {WAV_MAX_SAMPLES / sample_rate / 3600:.1f} "
+                         f"hours at {sample_rate} Hz; try a lower --sample-rate)")
+
+def create_wav(path, samples, sample_rate):
+    """Write the header and size the file; fill_wav writes the samples."""
+    check_wav_length(samples, sample_rate)
+    with open(path, 'wb') as f:
+        f.write(wav_header(samples, sample_rate))
+        f.truncate(WAV_HEADER_BYTES + 2 * samples)
+
+def fill_wav(job):
+    """Render one segment straight into its place in a WAV file; returns characters sent.
+
+    The job is an export_jobs job plus the file path. The file is mapped
+    one piece of the timeline at a time, so memory use stays at about one
+    EXPORT_BLOCK_SECONDS block whatever the length of the segment.
+    """
+    text, frequency, char_wpm, eff_wpm, mult, sample_rate, start, conditions, seed, path = job
+    timeline = compile_timeline(text, char_wpm, eff_wpm, mult, sample_rate, start=start)
+    simulator = band_simulator(conditions, seed)
+    first = int(np.floor(start + 0.5))
+    for rows, offset in timeline_chunks(timeline, int(EXPORT_BLOCK_SECONDS * sample_rate)):
+        count = int(rows['samples'].sum())
+        if not count:
+            continue
+        window = np.memmap(path, dtype='<i2', mode='r+', shape=(count,),
+                           offset=WAV_HEADER_BYTES + 2 * (first + offset))
+        if simulator is None:
+            render_timeline(rows, frequency, sample_rate, out=window)
+        else:
+            simulator.render(rows, frequency, sample_rate, first + offset, out=window)
+        window.flush()
+        del window
+    return timeline_stats(timeline, sample_rate)['characters']
+
+def export_jobs(words, frequency, char_wpm, eff_wpm, mult, sample_rate, conditions="off"):
+    """fill_wav jobs (without the path) for each segment of words.
+
+    Each carries its exact start and one shared seed, so the segments join
+    with the same sample-exact timing and band conditions as one big render.
+    """
+    position = 0.0
+    seed = random.randrange(2 ** 32)
+    for segment in iter_segments(words):
+        yield (segment, frequency, char_wpm, eff_wpm, mult, sample_rate, position, conditions, seed)
+        position += text_samples(segment, char_wpm, eff_wpm, mult, sample_rate)
+
+def export_length(words, char_wpm, eff_wpm, mult, sample_rate):
+    """Samples an export of words will have, without rendering anything."""
+    position = 0.0
+    for segment in iter_segments(words):
+        position += text_samples(segment, char_wpm, eff_wpm, mult, sample_rate)
+    return int(np.floor(position + 0.5))
+
+def file_words(f):
+    """A words() callable for export_wav that reads f from the start each time."""
+    def words():
+        f.seek(0)
+        return iter_words(f)
+    return words
+
+def export_wav(words, out_path, frequency, char_wpm, eff_wpm, mult,
+               sample_rate=SAMPLE_RATE, jobs=None, conditions="off"):
+    """Render words() (e.g. file_words(f)) to a mono 16-bit WAV using a process pool.
+
+    words is called twice: a cheap first pass sizes the file (header and
+    all) before any worker maps it, since Windows can't resize a file
+    while a view of it is mapped. Each worker then writes its segment
+    into place through np.memmap (see fill_wav). Only a few segments are
+    in flight at once, so memory use does not grow with the length of
+    the output. Returns (samples written, characters sent).
+    """
+    total = export_length(words(), char_wpm, eff_wpm, mult, sample_rate)
+    # Render next to the target and rename, so a failed export never
+    # leaves a full-length file that looks complete
+    temp_path = out_path + ".tmp"
+    create_wav(temp_path, total, sample_rate)
+    workers = jobs or os.cpu_count() or 1
+    characters = 0
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for job in export_jobs(words(), frequency, char_wpm, eff_wpm, mult, sample_rate, conditions):
+                pending.append(pool.submit(fill_wav, job + (temp_path,)))
+                if len(pending) >= 2 * workers:
+                    characters += pending.popleft().result()
+            while pending:
+                characters += pending.popleft().result()
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    os.replace(temp_path, out_path)
+    return total, characters
+
+def run_export(args) -> int:
+    out_path = resolve_path(args.outfile)
+    started = time.monotonic()
+    if args.calls is not None:
+        from callsigns import session_pool
+        calls = session_pool().draw_many(args.calls)
+        key_path = os.path.splitext(out_path)[0] + ".txt"
+        with open(key_path, "w", encoding="utf-8") as key:
+            key.write("\n".join(calls) + "\n")
+        print(f"Answer key: {key_path}")
+        words, f = (lambda: calls), None
+    else:
+        f = open_text_file(resolve_path(args.infile))
+        if f is None:
+            return 1
+        words = file_words(f)
+    try:
+        samples, characters = export_wav(words, out_path, args.freq, args.wpm, args.fwpm,
+                                         args.gap_mult, args.sample_rate, args.jobs, args.conditions)
+    except ValueError as e:
+        print(f"Export stopped: {e}")
+        return 1
+    finally:
+        if f is not None:
+            f.close()
+    elapsed = time.monotonic() - started
+    seconds = samples / args.sample_rate
+    print(f"Wrote {out_path}: {seconds:.1f}s of audio in {elapsed:.1f}s")
+    if seconds:
+        print(f"{characters} characters, {characters / 5.0 / (seconds / 60.0):.1f} WPM effective")
+    return 0
+
+def run_decode(args) -> int:
+    from decoder import decode_wav
+    path = resolve_path(args.infile)
+    if not os.path.exists(path):
+        print(f"File not found: {path}")
+        return 1
+    started = time.monotonic()
+    text, wpm = decode_wav(path, args.freq)
+    elapsed = time.monotonic() - started
+    print(text)
+    if wpm:
+        print(f"\nEstimated speed: {wpm:.1f} WPM (decoded in {elapsed:.1f}s)")
+    return 0
+
 # === Setting modifications ===
 def adjust_frequency():
     global current_frequency
     try:
-        new_frequency = int(input("Enter new frequency (400-1000 Hz): "))
+        new_frequency = int(read_line("Enter new frequency (400-1000 Hz): "))
         if 400 <= new_frequency <= 1000:
             current_frequency = new_frequency
+            clear_tone_cache()
             save_settings()
             print(f"Frequency set to {current_frequency} Hz.")
         else:
@@ -427,7 +1386,8 @@ def adjust_frequency():
 # === Menus (original layout + new file option) ===
 def settings_menu():
     global current_wpm, farnsworth_wpm, farnsworth_gap_mult
-    global show_morse, show_text, flash_card_mode_enabled, voice_enabled
+    global show_morse, show_text, flash_card_mode_enabled, voice_enabled, adaptive_enabled
+    global band_conditions
 
     while True:
         print_blue("\nSettings Menu")
@@ -439,16 +1399,22 @@ def settings_menu():
         print_blue(f"5. Toggle Voice Mode (currently {'ON' if voice_enabled else 'OFF'})")
         print_blue(f"6. Set Farnsworth WPM (effective) [current: {farnsworth_wpm}]")
         print_blue(f"7. Set Farnsworth gap multiplier (0.5–5.0) [current: {farnsworth_gap_mult:.2f}]")
-        choice = input("Choice: ").strip().lower()
+        print_blue("8. Show timing accuracy of last send")
+        print_blue(f"9. Toggle Adaptive Letter Selection (currently {'ON' if adaptive_enabled else 'OFF'})")
+        print_blue(f"10. Band Conditions: noise, fading, drift, QRM (currently {band_conditions.upper()})")
+        print_blue(f"11. Audio Output [{audio_sample_rate} Hz, buffer {audio_buffer}, "
+                   f"driver {audio_driver or 'auto'}]")
+        choice = read_line("Choice: ").strip().lower()
 
         if choice == '1':
             adjust_frequency()
 
         elif choice == '2':
             try:
-                w = int(input("Enter Character WPM (5–60): ").strip())
+                w = int(read_line("Enter Character WPM (5–60): ").strip())
                 if 5 <= w <= 60:
                     current_wpm = w
+                    clear_tone_cache()
                     save_settings()
                     print(f"Character WPM set to {current_wpm}")
                 else:
@@ -472,10 +1438,12 @@ def settings_menu():
             voice_enabled = not voice_enabled
             save_settings()
             print(f"Voice Mode is now {'ON' if voice_enabled else 'OFF'}")
+            if voice_enabled:
+                ensure_voice_cache()
 
         elif choice == '6':
             try:
-                fw = float(input("Enter Farnsworth WPM (effective, 2–40): ").strip())
+                fw = float(read_line("Enter Farnsworth WPM (effective, 2–40): ").strip())
                 if 2.0 <= fw <= 40.0:
                     farnsworth_wpm = fw
                     save_settings()
@@ -487,7 +1455,7 @@ def settings_menu():
 
         elif choice == '7':
             try:
-                m = float(input("Farnsworth gap multiplier (0.5–5.0): ").strip())
+                m = float(read_line("Farnsworth gap multiplier (0.5–5.0): ").strip())
                 if 0.5 <= m <= 5.0:
                     farnsworth_gap_mult = m
                     save_settings()
@@ -497,6 +1465,80 @@ def settings_menu():
             except ValueError:
                 print("Invalid input.")
 
+        elif choice == '8':
+            print_timing_summary()
+
+        elif choice == '9':
+            adaptive_enabled = not adaptive_enabled
+            save_settings()
+            print(f"Adaptive Letter Selection is now {'ON' if adaptive_enabled else 'OFF'}")
+
+        elif choice == '10':
+            band_conditions = BAND_PRESETS[(BAND_PRESETS.index(band_conditions) + 1) % len(BAND_PRESETS)]
+            save_settings()
+            print(f"Band conditions are now {band_conditions.upper()}")
+
+        elif choice == '11':
+            audio_menu()
+
+        elif choice == '0':
+            break
+
+        else:
+            print("Invalid choice.")
+
+def audio_menu():
+    global audio_sample_rate, audio_buffer, audio_driver, audio_latency_ms
+    from audio_calibration import CANDIDATE_BUFFERS, SAMPLE_RATES
+
+    while True:
+        print_blue("\nAudio Output")
+        print_blue("0. Return to Settings")
+        print_blue(f"1. Sample rate [current: {audio_sample_rate} Hz]")
+        print_blue(f"2. Playback buffer [current: {audio_buffer} samples]")
+        print_blue(f"3. Audio driver [current: {audio_driver or 'auto'}]")
+        print_blue(f"4. Calibrate: measure latency and underruns (sending practice buffer: {keyer_buffer})")
+        choice = read_line("Choice: ").strip().lower()
+
+        if choice == '1':
+            try:
+                rate = int(read_line(f"Sample rate ({', '.join(map(str, SAMPLE_RATES))}): ").strip())
+                if rate in SAMPLE_RATES:
+                    audio_sample_rate = rate
+                    audio_latency_ms = 0.0      # measured for the old setup
+                    save_settings()
+                    reopen_mixer()
+                    print(f"Sample rate set to {audio_sample_rate} Hz (the mixer opened at {output_rate} Hz)")
+                else:
+                    print("Invalid sample rate.")
+            except ValueError:
+                print("Invalid input.")
+
+        elif choice == '2':
+            try:
+                buffer = int(read_line(f"Buffer ({', '.join(map(str, CANDIDATE_BUFFERS))}): ").strip())
+                if buffer in CANDIDATE_BUFFERS:
+                    audio_buffer = buffer
+                    audio_latency_ms = 0.0
+                    save_settings()
+                    reopen_mixer()
+                    print(f"Playback buffer set to {audio_buffer} samples (calibrate to measure its latency)")
+                else:
+                    print("Invalid buffer size.")
+            except ValueError:
+                print("Invalid input.")
+
+        elif choice == '3':
+            audio_driver = read_line("SDL audio driver (e.g. pulseaudio, alsa, wasapi, coreaudio; "
+                                     "empty for auto): ").strip().lower()
+            audio_latency_ms = 0.0
+            save_settings()
+            restart_audio()
+            print(f"Audio driver is now {os.environ.get('SDL_AUDIODRIVER', 'auto')}")
+
+        elif choice == '4':
+            calibrate_audio()
+
         elif choice == '0':
             break
 
@@ -510,7 +1552,7 @@ def practice_week_menu():
         letters = week_letters[i]
         display = letters if i in [1, 2, 3, 4] else ''.join(sorted(set(letters)))
         print_blue(f"{i}. Week {i} ({display})")
-    choice = input("Choice: ").lower()
+    choice = read_line("Choice: ").lower()
     if choice == '0':
         return
     elif choice in [str(i) for i in range(1, 8)]:
@@ -526,7 +1568,8 @@ def random_word_menu():
     print_blue("3. Weeks 1–3 Words: " + ", ".join(week123_words))
     print_blue("4. Weeks 1–4 Words: " + ", ".join(week1234_words))
     print_blue("5. All Words: " + ", ".join(all_words))
-    choice = input("Choice: ").lower()
+    print_blue("6. Dictionary Words for Weeks 1–N")
+    choice = read_line("Choice: ").lower()
     if choice == '0':
         return
     elif choice == '1':
@@ -539,6 +1582,12 @@ def random_word_menu():
         play_random_text(week1234_words, count=3)
     elif choice == '5':
         play_random_text(all_words, count=3)
+    elif choice == '6':
+        week = read_line("Through week (1–7): ").strip()
+        if week in [str(i) for i in range(1, 8)]:
+            play_corpus_words(int(week))
+        else:
+            print("Invalid week.")
     else:
         print("Invalid choice.")
 
@@ -550,7 +1599,7 @@ def random_sentence_menu():
     print_blue("3. Weeks 1–3 Sentences: " + "; ".join(week123_sentences))
     print_blue("4. Weeks 1–4 Sentences: " + "; ".join(week1234_sentences))
     print_blue("5. Week 7 Sentences: " + "; ".join(week7_sentences))
-    choice = input("Choice: ").lower()
+    choice = read_line("Choice: ").lower()
     if choice == '0':
         return
     elif choice == '1':
@@ -573,11 +1622,17 @@ def quiz_mode_menu():
         letters = week_letters[i]
         display = letters if i in [1, 2, 3, 4] else ''.join(sorted(set(letters)))
         print_blue(f"{i}. Week {i} ({display})")
-    choice = input("Choice: ").lower()
+    print_blue("8. Show accuracy by character")
+    print_blue("9. Call signs")
+    choice = read_line("Choice: ").lower()
     if choice == '0':
         return
     elif choice in [str(i) for i in range(1, 8)]:
         quiz_mode(int(choice))
+    elif choice == '8':
+        show_char_stats()
+    elif choice == '9':
+        call_sign_quiz()
     else:
         print("Invalid choice.")
 
@@ -597,13 +1652,15 @@ def show_main_menu():
         print_blue("8. Settings")
         print_blue("9. Send from a text file")
         print_blue("10. Quiz Mode")
+        print_blue("11. Sending Practice")
+        print_blue("12. Pileup Practice")
 
         dot_s, _, inter_char_gap, inter_word_gap = timing_now()
         print(f"\nPress [Enter] to Pause. Press [q] then [Enter] to Stop.")
         print(f"\nDisplay: {'ON' if show_morse else 'OFF'} | Flash: {'ON' if flash_card_mode_enabled else 'OFF'} | Voice: {'ON' if voice_enabled else 'OFF'}"
               f" | WPM: {current_wpm} | Farnsworth: {farnsworth_wpm} | GapMult: {farnsworth_gap_mult:.2f} | Frequency: {current_frequency}Hz")
 
-        choice = input("Choice: ").lower()
+        choice = read_line("Choice: ").lower()
 
         if choice == '1':
             practice_week_menu()
@@ -612,29 +1669,34 @@ def show_main_menu():
         elif choice == '3':
             random_sentence_menu()
         elif choice == '4':
-            play_random_text(call_signs)
+            from callsigns import session_pool
+            play_text(session_pool().draw())
         elif choice == '5':
             practice_week_letters_continuously(8)
         elif choice == '6':
             practice_week_letters_continuously(9)
         elif choice == '7':
-            text = input("Enter custom text: ")
+            text = read_line("Enter custom text: ")
             play_text(text)
         elif choice == '8':
             settings_menu()
         elif choice == '9':  # NEW
-            p = input("Enter path to text file (e.g., ~/Desktop/qso.txt): ").strip()
+            p = read_line("Enter path to text file (e.g., ~/Desktop/qso.txt): ").strip()
             rp = resolve_path(p)
-            txt = load_text_file(rp)
-            if txt is None:
+            f = open_text_file(rp)
+            if f is None:
                 print_blue("Could not read file. Double-check the full path.")
             else:
-                # Normalize whitespace: collapse runs of whitespace to single spaces
-                cleaned = ' '.join(txt.split())
+                # Words are streamed with single spaces between them
                 print_blue(f"\nSending file: {rp}\n")
-                play_text(cleaned)
+                with f:
+                    send_text_file(f)
         elif choice == '10':
             quiz_mode_menu()
+        elif choice == '11':
+            sending_practice_menu()
+        elif choice == '12':
+            pileup_menu()
         elif choice == '0':
             print("Goodbye!")
             try:
@@ -646,6 +1708,144 @@ def show_main_menu():
         else:
             print("Invalid choice.")
 
+def pileup_menu():
+    print_blue("\nPileup Practice")
+    print_blue("0. Return to Main Menu")
+    print_blue("1. Start a pileup")
+    print_blue("2. Measure how many stations this computer can mix in real time")
+    choice = read_line("Choice: ").lower()
+    if choice == '0':
+        return
+    elif choice == '1':
+        from pileup import MIN_STATIONS, MAX_STATIONS
+        answer = read_line(f"How many stations ({MIN_STATIONS}-{MAX_STATIONS}, Enter for 10)? ").strip()
+        try:
+            count = int(answer) if answer else 10
+        except ValueError:
+            count = 0
+        if MIN_STATIONS <= count <= MAX_STATIONS:
+            play_pileup(count)
+        else:
+            print("Invalid number of stations.")
+    elif choice == '2':
+        from pileup import realtime_capacity
+        print_blue("Measuring (all stations keyed at once, one core)...")
+        print_blue(f"This computer can mix about {realtime_capacity(current_frequency)} stations in real time.")
+    else:
+        print("Invalid choice.")
+
+def play_pileup(count):
+    from pileup import Pileup, stream
+    ensure_audio()
+    from callsigns import session_pool
+    pileup = Pileup.random(count, current_frequency, output_rate, calls=session_pool().draw_many(count))
+    print_blue(f"\n{count} stations are calling...")
+    underruns = stream(pileup.blocks(), pygame)
+    if underruns:
+        print_blue(f"(audio could not keep up {underruns} time(s))")
+    heard = set(read_line("Calls you copied (separated by spaces): ").upper().split())
+    calls = pileup.calls()
+    copied = [c for c in calls if c in heard]
+    print_blue(f"You copied {len(copied)} of {len(calls)} calls: {' '.join(copied) or '-'}")
+    missed = [c for c in calls if c not in heard]
+    if missed:
+        print_blue(f"Missed: {' '.join(missed)}")
+    wrong = sorted(heard - set(calls))
+    if wrong:
+        print_blue(f"Not in the pileup: {' '.join(wrong)}")
+
+def sending_practice_menu():
+    print_blue("\nSending Practice (a small window opens; keep it focused)")
+    print_blue("0. Return to Main Menu")
+    print_blue("1. Straight key (Space)")
+    print_blue("2. Iambic keyer (Z / Left Ctrl = dit, X / Right Ctrl = dah)")
+    choice = read_line("Choice: ").lower()
+    if choice == '0':
+        return
+    elif choice in ['1', '2']:
+        sending_practice("straight" if choice == '1' else "iambic")
+    else:
+        print("Invalid choice.")
+
+def sending_practice(mode):
+    from keyer import run_keyer
+    # Per-element Sounds on a 1024-sample buffer lag the key by ~25 ms
+    reopen_mixer(keyer_buffer)
+    try:
+        run_keyer(mode, current_wpm, current_frequency,
+                  element_sounds(current_frequency, current_wpm, output_rate))
+    finally:
+        reopen_mixer()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Morse Code Trainer")
+    commands = parser.add_subparsers(dest="command")
+
+    export = commands.add_parser("export", help="render a text file to a WAV file")
+    source = export.add_mutually_exclusive_group(required=True)
+    source.add_argument("--in", dest="infile", help="text file to send")
+    source.add_argument("--calls", type=int, metavar="N",
+                        help="send N generated call signs instead (answer key saved next to the WAV)")
+    export.add_argument("--out", dest="outfile", required=True, help="WAV file to write")
+    export.add_argument("--wpm", type=int, default=current_wpm, help="character WPM (5-60)")
+    export.add_argument("--fwpm", type=float, default=farnsworth_wpm, help="Farnsworth WPM (2-40)")
+    export.add_argument("--gap-mult", type=float, default=farnsworth_gap_mult,
+                        help="Farnsworth gap multiplier (0.5-5.0)")
+    export.add_argument("--freq", type=int, default=current_frequency, help="tone frequency (400-1000 Hz)")
+    export.add_argument("--sample-rate", type=int, default=audio_sample_rate,
+                        help="output sample rate in Hz (8000-48000, as in Audio Output)")
+    export.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    export.add_argument("--conditions", choices=BAND_PRESETS, default=band_conditions,
+                        help="simulated band conditions (noise, fading, drift, QRM)")
+
+    build = commands.add_parser("build", help="render a curriculum to WAV lessons and answer keys")
+    build.add_argument("--spec", default=None, help="curriculum spec (JSON; default: the built-in course)")
+    build.add_argument("--out", dest="outdir", default=None, help="output directory")
+    build.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    build.add_argument("--force", action="store_true", help="re-render lessons that are up to date")
+    build.add_argument("--print-spec", action="store_true", help="print the built-in spec and exit")
+
+    commands.add_parser("calibrate", help="measure audio latency and underruns; keep the smallest safe buffer")
+
+    decode = commands.add_parser("decode", help="decode Morse audio from a WAV file")
+    decode.add_argument("--in", dest="infile", required=True, help="16-bit PCM WAV file")
+    decode.add_argument("--freq", type=float, default=None, help="tone frequency (default: detect)")
+    return parser
+
+def main(argv=None) -> int:
+    ensure_settings()
+    if np is None:
+        require("numpy", "NumPy")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        for option, value, (low, high) in (("--wpm", args.wpm, WPM_LIMITS),
+                                           ("--fwpm", args.fwpm, FARNSWORTH_LIMITS),
+                                           ("--gap-mult", args.gap_mult, GAP_MULT_LIMITS),
+                                           ("--freq", args.freq, FREQUENCY_LIMITS)):
+            if not low <= value <= high:
+                parser.error(f"{option} must be between {low:g} and {high:g}")
+        if args.calls is not None and args.calls < 1:
+            parser.error("--calls must be at least 1")
+        if args.jobs is not None and args.jobs < 1:
+            parser.error("--jobs must be at least 1")
+        from audio_calibration import SAMPLE_RATES
+        if args.sample_rate not in SAMPLE_RATES:
+            parser.error(f"--sample-rate must be one of {', '.join(map(str, SAMPLE_RATES))}")
+        return run_export(args)
+    if args.command == "build":
+        if args.jobs is not None and args.jobs < 1:
+            parser.error("--jobs must be at least 1")
+        from lesson_builder import run_build
+        return run_build(args)
+    if args.command == "decode":
+        return run_decode(args)
+    if args.command == "calibrate":
+        return 0 if calibrate_audio() is not None else 1
+    ensure_audio()
+    show_main_menu()
+    return 0
+
 # === Main Program ===
 if __name__ == "__main__":
-    show_main_menu()
+    exit(main())
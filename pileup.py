@@ -0,0 +1,168 @@
+"""Pileup simulator for the Morse Code Trainer.
+
+Many stations call at once, each with its own frequency offset, speed,
+strength and start time. Every station's key envelope is compiled once;
+playback then sums all stations in short numpy blocks (one sin/multiply
+pass per active station) and streams the blocks to one mixer channel,
+rendering each block while the previous one plays.
+"""
+import random
+import time
+
+import numpy as np
+
+from band_conditions import key_envelope
+from callsigns import session_pool
+from morsecode import SAMPLE_RATE, compile_timeline
+
+MIN_STATIONS, MAX_STATIONS = 5, 50
+OFFSET_HZ = 400.0           # stations spread over +/- this around the tone...
+MIN_TONE_HZ = 300.0         # ...but none lower than this, so every call can be heard
+WPM_RANGE = (16, 35)
+GAIN_DB = (-18.0, 0.0)
+MAX_START_SECONDS = 2.0
+STREAM_BLOCK_SECONDS = 0.1
+
+
+def offset_spread(frequency):
+    """Largest offset that keeps every station at or above MIN_TONE_HZ."""
+    return max(0.0, min(OFFSET_HZ, frequency - MIN_TONE_HZ))
+
+
+class Station:
+    """One calling station: its key envelope placed at an absolute start sample."""
+
+    def __init__(self, call, offset_hz, gain, start, envelope, wpm=None, rng=random):
+        self.call = call
+        self.offset_hz = offset_hz
+        self.wpm = wpm
+        self.gain = gain
+        self.start = start
+        self.phase = rng.uniform(0, 2 * np.pi)
+        self.envelope = envelope * np.float32(gain)
+        self.end = start + len(self.envelope)
+
+    @classmethod
+    def calling(cls, call, offset_hz, wpm, gain, start, sample_rate=SAMPLE_RATE, repeats=2, rng=random):
+        """A station sending its call `repeats` times."""
+        timeline = compile_timeline(" ".join([call] * repeats), wpm, wpm, 1.0, sample_rate)
+        return cls(call, offset_hz, gain, start, key_envelope(timeline, sample_rate), wpm, rng)
+
+
+class Pileup:
+    """A set of stations mixed block by block around a centre frequency."""
+
+    def __init__(self, stations, frequency, sample_rate=SAMPLE_RATE):
+        self.stations = stations
+        self.frequency = frequency
+        self.sample_rate = sample_rate
+        self.total = max((s.end for s in stations), default=0)
+
+    @classmethod
+    def random(cls, count, frequency, sample_rate=SAMPLE_RATE, calls=None, rng=random):
+        """count stations with random offsets, speeds, strengths and start times.
+
+        Calls come from the session's call-sign pool unless given.
+        """
+        if calls is None:
+            calls = session_pool().draw_many(count)
+        spread = offset_spread(frequency)
+        stations = [
+            Station.calling(call,
+                            offset_hz=rng.uniform(-spread, spread),
+                            wpm=rng.randint(*WPM_RANGE),
+                            gain=10 ** (rng.uniform(*GAIN_DB) / 20),
+                            start=int(rng.uniform(0, MAX_START_SECONDS) * sample_rate),
+                            sample_rate=sample_rate, rng=rng)
+            for call in calls[:count]]
+        return cls(stations, frequency, sample_rate)
+
+    def calls(self):
+        return sorted({s.call for s in self.stations})
+
+    def block(self, n0, n1):
+        """Samples n0..n1 of the mix as float32 (about -1..1)."""
+        out = np.zeros(n1 - n0, dtype=np.float32)
+        t = np.arange(n0, n1) / self.sample_rate
+        for s in self.stations:
+            lo, hi = max(n0, s.start), min(n1, s.end)
+            if lo >= hi:
+                continue
+            envelope = s.envelope[lo - s.start:hi - s.start]
+            if not envelope.any():
+                continue    # station is between elements for this whole block
+            w = 2 * np.pi * (self.frequency + s.offset_hz)
+            out[lo - n0:hi - n0] += envelope * np.sin(w * t[lo - n0:hi - n0] + s.phase).astype(np.float32)
+        # Keep headroom as the pileup grows, like a receiver AGC
+        return out * np.float32(0.8 / max(1.0, np.sqrt(len(self.stations))))
+
+    def blocks(self, block_seconds=STREAM_BLOCK_SECONDS):
+        """int16 blocks covering the whole pileup."""
+        step = max(1, int(block_seconds * self.sample_rate))
+        for n0 in range(0, self.total, step):
+            block = self.block(n0, min(self.total, n0 + step))
+            np.clip(block, -1.0, 1.0, out=block)
+            yield (block * 32767).astype(np.int16)
+
+
+def stream(blocks, pygame):
+    """Play int16 blocks back to back on one channel; returns the underrun count.
+
+    The next block is rendered while the current one plays and queued as
+    soon as the channel's queue slot is free.
+    """
+    underruns = 0
+    channel = None
+    for block in blocks:
+        sound = pygame.sndarray.make_sound(block)
+        if channel is None:
+            channel = sound.play()
+            continue
+        while channel.get_queue() is not None:
+            time.sleep(0.002)
+        if channel.get_busy():
+            channel.queue(sound)
+        else:
+            underruns += 1      # the previous block ran out before this one was ready
+            channel = sound.play()
+    while channel is not None and channel.get_busy():
+        time.sleep(0.005)
+    return underruns
+
+
+def realtime_capacity(frequency=600, sample_rate=SAMPLE_RATE, block_seconds=STREAM_BLOCK_SECONDS,
+                      limit=5000, headroom=0.5):
+    """Most stations one core can mix in real time, all keyed at once.
+
+    A block must render in headroom * its own duration, leaving the rest of
+    the time for the mixer and everything else.
+    """
+    step = int(block_seconds * sample_rate)
+    budget = block_seconds * headroom
+    spread = offset_spread(frequency)
+
+    def fits(count):
+        # Worst case: every station key-down for the whole block
+        stations = [Station("", random.uniform(-spread, spread), 1.0, 0,
+                            np.ones(step, dtype=np.float32)) for _ in range(count)]
+        pileup = Pileup(stations, frequency, sample_rate)
+        pileup.block(0, step)       # warm up
+        return min(timed(pileup.block, step) for _ in range(3)) <= budget
+
+    low, high = 0, 1
+    while high <= limit and fits(high):
+        low, high = high, high * 2
+    high = min(high, limit + 1)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def timed(mix, step):
+    start = time.perf_counter()
+    mix(0, step)
+    return time.perf_counter() - start
@@ -0,0 +1,139 @@
+"""Persistent practice statistics for the Morse Code Trainer.
+
+Every quiz answer is stored in a small SQLite database. Writes are queued
+and committed in batches on a background thread, so recording an answer
+never blocks playback; reads use their own connection.
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+
+STATS_FILE = "morse_stats.sqlite3"
+BATCH_SIZE = 200          # answers per transaction at most
+FLUSH_SECONDS = 0.5       # longest an answer waits before it is written
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id             INTEGER PRIMARY KEY,
+    ts             REAL    NOT NULL,
+    char           TEXT    NOT NULL,
+    guess          TEXT    NOT NULL,
+    correct        INTEGER NOT NULL,
+    response_ms    REAL    NOT NULL,
+    wpm            INTEGER NOT NULL,
+    farnsworth_wpm REAL    NOT NULL,
+    gap_mult       REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_char_id ON answers (char, id);
+"""
+
+# Walks the (char, id) index once per distinct character instead of
+# scanning every row, so it stays fast with millions of answers.
+DISTINCT_CHARS = """
+WITH RECURSIVE chars(c) AS (
+    SELECT MIN(char) FROM answers
+    UNION ALL
+    SELECT (SELECT MIN(char) FROM answers WHERE char > chars.c) FROM chars WHERE chars.c IS NOT NULL
+)
+SELECT c FROM chars WHERE c IS NOT NULL
+"""
+
+RECENT_FOR_CHAR = """
+SELECT COUNT(*), TOTAL(correct), AVG(response_ms)
+FROM (SELECT correct, response_ms FROM answers WHERE char = ? ORDER BY id DESC LIMIT ?)
+"""
+
+_CLOSE = object()
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30.0)
+    # WAL lets the menus read while the writer thread commits
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class StatsStore:
+    """SQLite store of quiz answers with batched, non-blocking writes."""
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self.pending = queue.Queue()
+        self.writer = None
+        self.reader = None
+
+    def _start(self):
+        if self.writer is None:
+            connect(self.path).close()      # create the schema before anyone reads
+            self.writer = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    def record(self, char, guess, correct, response_ms, wpm, farnsworth_wpm, gap_mult):
+        """Queue one answer; returns immediately."""
+        self._start()
+        self.pending.put((time.time(), char, guess, int(bool(correct)), float(response_ms),
+                          int(wpm), float(farnsworth_wpm), float(gap_mult)))
+
+    def _run(self):
+        conn = connect(self.path)
+        closing = False
+        while not closing:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH_SIZE and batch[-1] is not _CLOSE:
+                try:
+                    batch.append(self.pending.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is _CLOSE:
+                closing = True
+            rows = [row for row in batch if row is not _CLOSE]
+            if rows:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO answers (ts, char, guess, correct, response_ms, wpm,"
+                        " farnsworth_wpm, gap_mult) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            for _ in batch:
+                self.pending.task_done()
+        conn.close()
+
+    def flush(self):
+        """Block until every queued answer has been written."""
+        if self.writer is not None:
+            self.pending.join()
+
+    def close(self):
+        if self.writer is not None and self.writer.is_alive():
+            self.pending.put(_CLOSE)
+            self.writer.join()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def _read(self):
+        self._start()
+        self.flush()
+        if self.reader is None:
+            self.reader = connect(self.path)
+        return self.reader
+
+    def char_accuracy(self, last_n=50, chars=None):
+        """Accuracy over each character's last_n answers.
+
+        Returns {char: (attempts, accuracy 0-1, mean response ms)} for every
+        character that has answers (or only those in chars).
+        """
+        conn = self._read()
+        if chars is None:
+            chars = [row[0] for row in conn.execute(DISTINCT_CHARS)]
+        results = {}
+        for char in chars:
+            attempts, correct, mean_ms = conn.execute(RECENT_FOR_CHAR, (char, last_n)).fetchone()
+            if attempts:
+                results[char] = (attempts, correct / attempts, mean_ms)
+        return results
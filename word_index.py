@@ -0,0 +1,114 @@
+"""Word corpus indexed by letter set, for week-appropriate practice words.
+
+Each word's set of characters is stored as a bitmask. Asking for words
+that only use a given set of letters is one vectorized numpy pass the
+first time, cached afterwards, so every further draw is O(1).
+"""
+import os
+import random
+import re
+
+import numpy as np
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,?/"
+BIT = {char: 1 << i for i, char in enumerate(ALPHABET)}
+ALL_BITS = (1 << len(ALPHABET)) - 1
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_FILES = [os.path.join(HERE, name) for name in
+                ("masterletters.txt", "4letters.txt", "5letters.txt", "6letters.txt")]
+SYSTEM_DICTIONARY = "/usr/share/dict/words"
+
+
+def letter_mask(word):
+    """Bitmask of the characters in word, or None if one can't be sent."""
+    mask = 0
+    for char in word:
+        bit = BIT.get(char)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+def split_line(line):
+    """Words on one line of either corpus format.
+
+    Plain files hold whitespace-separated words. The letter files
+    (e.g. masterletters.txt) space every letter out and put a longer run
+    of spaces between words; the threshold sits between the two run lengths.
+    """
+    tokens = line.split()
+    runs = [len(run) for run in re.findall(r"\s+", line.strip())]
+    if len(tokens) > 1 and all(len(t) == 1 for t in tokens) and len(set(runs)) > 1:
+        threshold = (min(runs) + max(runs)) / 2
+        words, current = [], tokens[0]
+        for token, run in zip(tokens[1:], runs):
+            if run > threshold:
+                words.append(current)
+                current = token
+            else:
+                current += token
+        words.append(current)
+        return words
+    return tokens
+
+
+def read_words(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            yield from split_line(line)
+
+
+class WordIndex:
+    """Deduplicated words with a uint64 letter-set mask per word."""
+
+    def __init__(self, words):
+        kept = {}
+        for word in words:
+            word = word.strip().upper()
+            if len(word) > 1 and word not in kept:
+                mask = letter_mask(word)
+                if mask is not None:
+                    kept[word] = mask
+        self.words = list(kept)
+        self.masks = np.fromiter(kept.values(), dtype=np.uint64, count=len(kept))
+        self._subsets = {}
+
+    @classmethod
+    def load(cls, paths=None, extra=()):
+        """Index the bundled letter files plus the system dictionary if present, and extra words."""
+        if paths is None:
+            paths = CORPUS_FILES + [SYSTEM_DICTIONARY]
+        words = list(extra)
+        for path in paths:
+            if os.path.exists(path):
+                words.extend(read_words(path))
+        return cls(words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def words_for(self, letters):
+        """Indices of every word spelled only with letters (cached per letter set)."""
+        allowed = 0
+        for char in letters.upper():
+            allowed |= BIT.get(char, 0)
+        found = self._subsets.get(allowed)
+        if found is None:
+            forbidden = np.uint64(ALL_BITS & ~allowed)
+            found = np.flatnonzero((self.masks & forbidden) == 0)
+            self._subsets[allowed] = found
+        return found
+
+    def random_words(self, letters, count=1, rng=random):
+        """count random words using only letters (empty list if there are none).
+
+        Words don't repeat unless fewer than count of them can be spelled.
+        """
+        found = self.words_for(letters)
+        if len(found) == 0:
+            return []
+        if len(found) >= count:
+            return [self.words[found[i]] for i in rng.sample(range(len(found)), count)]
+        return [self.words[found[int(rng.random() * len(found))]] for _ in range(count)]